@@ -5,16 +5,25 @@ from typing import Optional
 import pkg_resources
 from flask import Config
 from flask import Flask
+from flask.signals import got_request_exception
 from flask.signals import request_finished
 from flask.signals import request_started
 
 from .config import configure_logging
 from .flask import FlaskAppInformation
+from .flask import log_app_information
 from .flask import log_request
 from .flask import log_response
 from .flask import request_set_id
 from .flask import request_track_time
 from .flask import RequestInformation
+from .flask import RequestLoggers
+from .metrics import EXTENSION_NAME as METRICS_EXTENSION_NAME
+from .metrics import LatencyHistograms
+from .metrics import metrics_blueprint
+from .sampling import record_exception
+from .sampling import RequestSampler
+from .timing import RequestPhaseTimer
 
 
 class FlaskLogging:
@@ -29,10 +38,10 @@ class FlaskLogging:
         if app is not None:
             self.init_app(app)
 
-    def add_flask_filters(self, logger: logging.Logger) -> None:
+    def add_flask_filters(self, logger: logging.Logger, app_information: bool = True) -> None:
         if not any(isinstance(f, RequestInformation) for f in logger.filters):
             logger.addFilter(RequestInformation())
-        if not any(isinstance(f, FlaskAppInformation) for f in logger.filters):
+        if app_information and not any(isinstance(f, FlaskAppInformation) for f in logger.filters):
             logger.addFilter(FlaskAppInformation())
 
     def set_defaults(self, app: Flask) -> None:
@@ -51,18 +60,39 @@ class FlaskLogging:
         if app.config.get("FLASK_LOGGING_REQUEST_ID"):
             request_set_id.init_app(app)
 
-        if app.config.get("FLASK_LOGGING_REQUEST_DURATION"):
+        if app.config.get("FLASK_LOGGING_METRICS"):
+            metrics = LatencyHistograms(max_series=app.config.get("FLASK_LOGGING_METRICS_MAX_SERIES", 1000))
+            app.extensions[METRICS_EXTENSION_NAME] = metrics
+            if app.config.get("FLASK_LOGGING_METRICS_ENDPOINT"):
+                app.register_blueprint(
+                    metrics_blueprint(metrics), url_prefix=app.config["FLASK_LOGGING_METRICS_ENDPOINT"]
+                )
+
+        if app.config.get("FLASK_LOGGING_REQUEST_DURATION") or app.config.get("FLASK_LOGGING_METRICS"):
             request_track_time.init_app(app)
 
+        if app.config.get("FLASK_LOGGING_REQUEST_PHASES") or app.config.get("FLASK_LOGGING_SERVER_TIMING"):
+            RequestPhaseTimer.from_config(app.config).init_app(app)
+
+        sampler = RequestSampler.from_config(app.config)
+        if sampler.enabled:
+            sampler.init_app(app)
+            got_request_exception.connect(record_exception, app)
+
+        loggers = RequestLoggers.from_app(app)
+        loggers.init_app(app)
+
         if app.config.get("FLASK_LOGGING_REQUEST_FINISHED"):
             request_finished.connect(log_response, app)
         if app.config.get("FLASK_LOGGING_REQUEST_STARTED"):
             request_started.connect(log_request, app)
 
+        app_information = app.config.get("FLASK_LOGGING_APP_INFORMATION", "record")
+        if app_information == "startup":
+            app.before_request(lambda: log_app_information(app))
+
         if app.config.get("FLASK_LOGGING_REQUEST_LOGGER"):
-            logger_name = app.config.get("FLASK_LOGGING_REQUEST_LOGGER_NAME", "request")
-            self.add_flask_filters(app.logger.getChild(logger_name))
+            self.add_flask_filters(loggers.request, app_information == "record")
 
         if app.config.get("FLASK_LOGGING_RESPONSE_LOGGER"):
-            logger_name = app.config.get("FLASK_LOGGING_RESPONSE_LOGGER_NAME", "response")
-            self.add_flask_filters(app.logger.getChild(logger_name))
+            self.add_flask_filters(loggers.response, app_information == "record")
@@ -1,8 +1,16 @@
+import dataclasses as dc
 import logging.config
+import os
 import time
 import uuid
 from typing import Any
+from typing import cast
 from typing import Dict
+from typing import Iterator
+from typing import MutableMapping
+from typing import Optional
+from typing import Tuple
+from weakref import WeakKeyDictionary
 
 from flask import current_app
 from flask import Flask
@@ -10,12 +18,48 @@ from flask import g
 from flask import has_app_context
 from flask import has_request_context
 from flask import request
+from flask import Request
 from flask import Response
 
+from .metrics import get_metrics
 from .request_context import request_context_manger
 from .request_context import RequestContextGenerator
+from .sampling import get_sampler
+from .sampling import RequestSampler
 
-__all__ = ["FlaskAppInformation", "RequestInformation", "log_request", "log_response"]
+__all__ = [
+    "FlaskAppInformation",
+    "RequestInformation",
+    "LazyRequestInformation",
+    "app_information",
+    "log_app_information",
+    "log_request",
+    "log_response",
+    "RequestLoggers",
+    "get_request_loggers",
+]
+
+EXTENSION_NAME = "flask_logging.loggers"
+
+_MISSING = object()
+
+_app_information: "WeakKeyDictionary[Flask, Dict[str, Any]]" = WeakKeyDictionary()
+_app_information_logged: "WeakKeyDictionary[Flask, int]" = WeakKeyDictionary()
+
+
+def app_information(app: Flask) -> Dict[str, Any]:
+    """
+    Information about a flask app and its configuration, as added to log records.
+
+    The information is gathered once for each app, and the same dictionary is returned
+    on every call, so it should not be modified.
+    """
+    try:
+        return _app_information[app]
+    except KeyError:
+        info = dict(environment=app.env, instance_path=app.instance_path, name=app.name)
+        _app_information[app] = info
+        return info
 
 
 class FlaskAppInformation(logging.Filter):
@@ -25,36 +69,132 @@ class FlaskAppInformation(logging.Filter):
 
     def filter(self, log_record: Any) -> bool:
         if has_app_context():
-            log_record.flask = dict(
-                environment=current_app.env, instance_path=current_app.instance_path, name=current_app.name
-            )
+            log_record.flask = app_information(current_app._get_current_object())
         return True
 
 
+def log_app_information(app: Flask) -> None:
+    """
+    Log the information about a flask app, once in each process.
+
+    This is an alternative to :class:`FlaskAppInformation` which doesn't repeat the app
+    information on every record. It can be called for each request, as it only logs the
+    first time it is called with each app in a process.
+    """
+    pid = os.getpid()
+    if _app_information_logged.get(app) == pid:
+        return
+    _app_information_logged[app] = pid
+
+    logger_name = app.config.get("FLASK_LOGGING_APP_LOGGER_NAME", "app")
+    logger = app.logger.getChild(logger_name)
+    logger.info(f"Started {app.name}", extra={"flask": app_information(app), "event": "app_started"})
+
+
+class LazyRequestInformation(MutableMapping[str, Any]):
+    """
+    Information about a request, which is only gathered when it is read.
+
+    The mapping holds a reference to the request object, rather than the request proxy, so it can
+    still be read after the request context is torn down, e.g. by a queued handler. The information
+    is gathered at most once per request, and is shared by every record from the request, until a
+    filter adds to or changes the information for a record (e.g. to add a ``username``), which makes
+    a copy for that record. It pickles as a plain :class:`dict`.
+
+    Parameters
+    ----------
+    request: flask.Request
+        The request object.
+    request_id: str, optional
+        The ID of the request, from ``g.request_id``.
+
+    """
+
+    __slots__ = ("_request", "_request_id", "_data", "_copied")
+
+    #: Attribute of the request object where the request information is cached.
+    cache_attribute = "_flask_logging_request_info"
+
+    def __init__(self, request: Request, request_id: Any = _MISSING) -> None:
+        self._request = request
+        self._request_id = request_id
+        self._data: Optional[Dict[str, Any]] = None
+        self._copied = False
+
+    def _resolve(self) -> Dict[str, Any]:
+        if self._data is not None:
+            return self._data
+
+        # Share the information with other records from this request, unless the request ID has changed.
+        cached = getattr(self._request, self.cache_attribute, None)
+        if cached is not None and cached[0] is self._request_id:
+            self._data = cached[1]
+            return cached[1]
+
+        current = self._request
+        data = {
+            "path": current.path,
+            "method": current.method,
+            "remote_addr": current.remote_addr,
+            "user_agent": current.user_agent,
+        }
+        if "SERVER_PROTOCOL" in current.environ:
+            data["protocol"] = current.environ["SERVER_PROTOCOL"]
+
+        if self._request_id is not _MISSING:
+            data["id"] = self._request_id
+
+        setattr(current, self.cache_attribute, (self._request_id, data))
+        self._data = data
+        return data
+
+    def __getitem__(self, key: str) -> Any:
+        return self._resolve()[key]
+
+    def _writable(self) -> Dict[str, Any]:
+        # Don't change the information shared with other records from the request.
+        if not self._copied:
+            self._data = dict(self._resolve())
+            self._copied = True
+        return cast(Dict[str, Any], self._data)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._writable()[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._writable()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._resolve())
+
+    def __len__(self) -> int:
+        return len(self._resolve())
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._resolve()!r})"
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (dict, (dict(self._resolve()),))
+
+
 class RequestInformation(logging.Filter):
     """
     Add request information to log records
+
+    The ``request`` attribute of each record is a :class:`LazyRequestInformation`, so the details of the
+    request are only gathered if a formatter reads them, and then only once per request.
     """
 
     def filter(self, log_record: Any) -> bool:
         """Enrich log records with request infomration"""
         if has_request_context():
+            current = request._get_current_object()
+            environ = current.environ
 
-            log_record.request = {
-                "path": request.path,
-                "method": request.method,
-                "remote_addr": request.remote_addr,
-                "user_agent": request.user_agent,
-            }
-            if "SERVER_PROTOCOL" in request.environ:
-                log_record.request["protocol"] = request.environ["SERVER_PROTOCOL"]
-
-            if hasattr(g, "request_id"):
-                log_record.request["id"] = g.request_id
-
-            log_record.url = request.path
-            log_record.method = request.method
-            log_record.remote_addr = request.remote_addr
+            log_record.request = LazyRequestInformation(current, g.get("request_id", _MISSING))
+            log_record.url = current.path
+            log_record.method = environ.get("REQUEST_METHOD", "GET").upper()
+            log_record.remote_addr = environ.get("REMOTE_ADDR")
 
         else:
             log_record.request = {}
@@ -65,13 +205,75 @@ class RequestInformation(logging.Filter):
         return True
 
 
+@dc.dataclass
+class RequestLoggers:
+    """
+    The loggers and settings used to log requests and responses for an app.
+
+    These are resolved once, when the extension is initialized, so that logging a request
+    doesn't read the configuration or look up loggers.
+
+    Parameters
+    ----------
+    request: logging.Logger
+        Logger for the start of requests.
+    response: logging.Logger
+        Logger for responses.
+    sampler: RequestSampler, optional
+        The request sampler, if only some requests are logged.
+    request_ids: bool
+        Whether requests are given IDs, which must be set before requests are sampled.
+
+    """
+
+    request: logging.Logger
+    response: logging.Logger
+    sampler: Optional[RequestSampler] = None
+    request_ids: bool = False
+
+    @classmethod
+    def from_app(cls, app: Flask) -> "RequestLoggers":
+        """Resolve the loggers for an app from its configuration"""
+        request_name = app.config.get("FLASK_LOGGING_REQUEST_LOGGER_NAME", "request")
+        response_name = app.config.get("FLASK_LOGGING_RESPONSE_LOGGER_NAME", "response")
+        return cls(
+            request=app.logger.getChild(request_name),
+            response=app.logger.getChild(response_name),
+            sampler=get_sampler(app),
+            request_ids=bool(app.config.get("FLASK_LOGGING_REQUEST_ID")),
+        )
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions[EXTENSION_NAME] = self
+
+
+def get_request_loggers(app: Flask) -> RequestLoggers:
+    """The request loggers for an app, which are resolved now if the extension has not been initialized"""
+    loggers = app.extensions.get(EXTENSION_NAME)
+    if loggers is None:
+        loggers = RequestLoggers.from_app(app)
+        loggers.init_app(app)
+    return loggers
+
+
 def log_request(sender: Flask, **extra: Any) -> None:
     """
     Log the start of a request to a flask app.
     """
-    logger_name = sender.config.get("FLASK_LOGGING_REQUEST_LOGGER_NAME", "request")
+    loggers = get_request_loggers(sender)
+    logger = loggers.request
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+
+    sampler = loggers.sampler
+    if sampler is not None:
+        # The request_started signal is sent before request_set_id runs, so set the ID now, as the
+        # sampling decision is made from it.
+        if loggers.request_ids:
+            current_request_id()
+        if not sampler.sampled():
+            return
 
-    logger = sender.logger.getChild(logger_name)
     logger.debug(f"{request.method} {request.url} BEGIN", extra={"event": "request_started"})
 
 
@@ -81,8 +283,14 @@ def log_response(sender: Flask, response: Response, **extra: Any) -> None:
 
     Should be attached to the `request_finished` signal.
     """
-    logger_name = sender.config.get("FLASK_LOGGING_RESPONSE_LOGGER_NAME", "response")
-    logger = sender.logger.getChild(logger_name)
+    loggers = get_request_loggers(sender)
+    logger = loggers.response
+    if not logger.isEnabledFor(logging.INFO):
+        return
+
+    sampler = loggers.sampler
+    if sampler is not None and not (sampler.sampled() or sampler.keep(response)):
+        return
 
     response_keywords: Dict[str, Any] = {}
     response_keywords["status"] = response.status
@@ -96,9 +304,28 @@ def log_response(sender: Flask, response: Response, **extra: Any) -> None:
     if "_request_duration" in g:
         response_keywords["request_duration"] = g._request_duration
 
+    if "_request_phases" in g:
+        response_keywords["phases"] = g._request_phases
+
     logger.info(f"{response.status}", extra=dict(response=response_keywords, event="request_finished"))
 
 
+def current_request_id() -> str:
+    """
+    The ID of the current request, from the request ID header, or a new UUID.
+
+    The ID is stored as ``g.request_id``, so the same ID is used for the rest of the request.
+    """
+    request_id = g.get("request_id", None)
+    if request_id is None:
+        request_header = current_app.config.get("FLASK_LOGGING_REQUEST_ID_HEADER", "X-Request-ID")
+        request_id = request.headers.get(request_header, None)
+        if request_id is None:
+            request_id = str(uuid.uuid4())
+        g.request_id = request_id
+    return request_id
+
+
 @request_context_manger
 def request_set_id() -> RequestContextGenerator:
     """
@@ -106,12 +333,7 @@ def request_set_id() -> RequestContextGenerator:
     """
 
     request_header = current_app.config.get("FLASK_LOGGING_REQUEST_ID_HEADER", "X-Request-ID")
-
-    request_id = request.headers.get(request_header, None)
-    if request_id is None:
-        request_id = str(uuid.uuid4())
-
-    g.setdefault("request_id", request_id)
+    request_id = current_request_id()
     response = yield
     response.headers.setdefault(request_header, g.get("request_id", request_id))
     return response
@@ -126,4 +348,8 @@ def request_track_time() -> RequestContextGenerator:
     response = yield
     duration = time.monotonic() - start_time
     g._request_duration = duration
+
+    metrics = get_metrics(current_app)
+    if metrics is not None:
+        metrics.observe(request.endpoint, request.method, response.status_code, duration)
     return response
@@ -0,0 +1,113 @@
+"""
+A compact binary wire format for log records, built on msgpack.
+
+Standard log record attributes are stored under fixed integer tags, and any other
+attributes are stored under their names, so records are smaller and faster to parse
+than the equivalent JSON. This format requires the ``msgpack`` package.
+"""
+import logging
+import warnings
+from typing import Any
+from typing import Dict
+from typing import Optional
+from typing import Union
+
+from .json import FlexJSONEncoder
+from .json import JSONLogWarning
+
+__all__ = ["BinaryFormatter", "makeLogRecordfromBinary"]
+
+#: Version byte which prefixes every binary record.
+BINARY_FORMAT_VERSION = b"\x01"
+
+# The position of each attribute is its tag on the wire, so this order must never change.
+# New attributes must be added at the end.
+BINARY_FIELDS = (
+    "message",
+    "msg",
+    "args",
+    "asctime",
+    "created",
+    "msecs",
+    "relativeCreated",
+    "pathname",
+    "filename",
+    "module",
+    "lineno",
+    "funcName",
+    "stack_info",
+    "exc_info",
+    "exc_text",
+    "threadName",
+    "thread",
+    "process",
+    "processName",
+    "name",
+    "levelno",
+    "levelname",
+    "clevelname",
+)
+
+BINARY_FIELD_TAGS: Dict[str, int] = {name: tag for tag, name in enumerate(BINARY_FIELDS)}
+
+
+def _convert(obj: Any) -> Any:
+    """Convert objects which msgpack can't serialize, using the JSON converters."""
+    converter = FlexJSONEncoder.resolve(type(obj))
+    if converter is not None:
+        return converter(obj)
+
+    warnings.warn(JSONLogWarning(f"Unable to marshal type {type(obj)} to JSON"))
+    return f"<Unecodeable type: {type(obj)!r} {obj!r}>"
+
+
+class BinaryFormatter(logging.Formatter):
+    """
+    Format log records in the compact binary format.
+
+    This formatter produces `bytes`, and so should be used with handlers which can send
+    binary data, such as :class:`~flask_logging.handlers.redis.RedisPublisher`.
+    """
+
+    def __init__(self, fmt: Optional[str] = None, datefmt: Optional[str] = None, style: str = "%") -> None:
+        import msgpack
+
+        super().__init__(fmt=fmt, datefmt=datefmt, style=style)  # type: ignore[arg-type]
+        self._msgpack = msgpack
+
+    def format(self, record: logging.LogRecord) -> bytes:  # type: ignore[override]
+        """
+        Format a record for output
+        """
+        ei = record.exc_info
+        if ei:
+            _ = super().format(record)  # just to get traceback text into record.exc_text
+            record.exc_info = None  # to avoid Unpickleable error
+
+        tags = BINARY_FIELD_TAGS
+        data: Dict[Union[int, str], Any] = {tags.get(key, key): value for key, value in record.__dict__.items()}
+        s = BINARY_FORMAT_VERSION + self._msgpack.packb(data, default=_convert, use_bin_type=True)
+
+        if ei:
+            record.exc_info = ei  # for next handler
+        return s
+
+
+def makeLogRecordfromBinary(data: bytes) -> logging.LogRecord:
+    """
+    Create a log record from data produced by :class:`BinaryFormatter`.
+    """
+    import msgpack
+
+    if data[:1] != BINARY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary log record version: {data[:1]!r}")
+
+    raw = msgpack.unpackb(memoryview(data)[1:], raw=False, strict_map_key=False)
+
+    fields = BINARY_FIELDS
+    recordinfo = {(fields[key] if isinstance(key, int) else key): value for key, value in raw.items()}
+
+    if isinstance(recordinfo.get("args"), list):
+        recordinfo["args"] = tuple(recordinfo["args"])
+
+    return logging.makeLogRecord(recordinfo)
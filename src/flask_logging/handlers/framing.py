@@ -0,0 +1,161 @@
+"""
+Framing for batches of formatted log messages, with optional compression.
+
+A frame holds one or more messages, and starts with a fixed header which identifies
+the codec used to compress them. Formatted records never start with the frame magic
+bytes, so watchers can accept both framed and plain messages on the same channel.
+
+Each message can also carry a small record header, with the level, logger name and
+timestamp of the record, so that watchers can skip records without decoding them.
+"""
+import struct
+import zlib
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+__all__ = [
+    "Codec",
+    "CODECS",
+    "encode_frame",
+    "decode_frame",
+    "is_frame",
+    "unframe",
+    "RecordHeader",
+    "HeaderFilter",
+    "add_header",
+    "split_header",
+]
+
+Message = Union[str, bytes]
+
+#: Bytes which start every frame, followed by a single codec id byte.
+FRAME_MAGIC = b"\x00FLF"
+
+#: Bytes which start every message with a record header.
+HEADER_MAGIC = b"\x00FLH"
+
+_LENGTH = struct.Struct(">I")
+_HEADER = struct.Struct(">HdH")
+
+
+class Codec(NamedTuple):
+    """A compression codec which can be used for frames"""
+
+    id: int
+    name: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def _identity(data: bytes) -> bytes:
+    return data
+
+
+#: Codecs available for frames, by name.
+CODECS: Dict[str, Codec] = {
+    "none": Codec(0, "none", _identity, _identity),
+    "zlib": Codec(1, "zlib", lambda data: zlib.compress(data, 6), zlib.decompress),
+}
+
+
+def _codec_by_id(codec_id: int) -> Codec:
+    for codec in CODECS.values():
+        if codec.id == codec_id:
+            return codec
+    raise ValueError(f"Unknown frame codec id {codec_id}")
+
+
+def _as_bytes(message: Message) -> bytes:
+    return message.encode("utf-8") if isinstance(message, str) else message
+
+
+def encode_frame(messages: Sequence[Message], codec: str = "zlib") -> bytes:
+    """Pack messages into a single frame, compressed with `codec`."""
+    c = CODECS[codec]
+    parts = []
+    for message in messages:
+        data = _as_bytes(message)
+        parts.append(_LENGTH.pack(len(data)))
+        parts.append(data)
+    return FRAME_MAGIC + bytes((c.id,)) + c.compress(b"".join(parts))
+
+
+def is_frame(data: Message) -> bool:
+    """Whether a message is a frame, rather than a single formatted record"""
+    return isinstance(data, bytes) and data[: len(FRAME_MAGIC)] == FRAME_MAGIC
+
+
+def decode_frame(data: bytes) -> List[bytes]:
+    """Unpack the messages from a frame."""
+    if not is_frame(data):
+        raise ValueError("Data is not a log message frame")
+
+    header = len(FRAME_MAGIC)
+    body = _codec_by_id(data[header]).decompress(data[header + 1 :])
+
+    messages = []
+    position = 0
+    while position < len(body):
+        (length,) = _LENGTH.unpack_from(body, position)
+        position += _LENGTH.size
+        messages.append(body[position : position + length])
+        position += length
+    return messages
+
+
+def unframe(data: bytes) -> List[bytes]:
+    """Get the messages from a frame, or a single plain message, as a list."""
+    if is_frame(data):
+        return decode_frame(data)
+    return [data]
+
+
+class RecordHeader(NamedTuple):
+    """The fields of a record which are available before it is decoded"""
+
+    levelno: int
+    created: float
+    name: str
+
+
+class HeaderFilter(NamedTuple):
+    """
+    Select records by level and logger, as a :class:`logging.Filter` would.
+
+    Records are selected when they are at or above `level`, and when `logger` is empty, or is the
+    name of the record's logger or one of its ancestors.
+    """
+
+    level: int = 0
+    logger: str = ""
+
+    def matches(self, levelno: int, name: str) -> bool:
+        if levelno < self.level:
+            return False
+        if not self.logger or name == self.logger:
+            return True
+        return name.startswith(self.logger) and name[len(self.logger)] == "."
+
+
+def add_header(message: Message, levelno: int, name: str, created: float) -> bytes:
+    """Prefix a formatted message with a record header."""
+    encoded = name.encode("utf-8")
+    return HEADER_MAGIC + _HEADER.pack(levelno, created, len(encoded)) + encoded + _as_bytes(message)
+
+
+def split_header(data: bytes) -> Tuple[Optional[RecordHeader], bytes]:
+    """Separate the record header from a message, if it has one."""
+    if data[: len(HEADER_MAGIC)] != HEADER_MAGIC:
+        return None, data
+
+    start = len(HEADER_MAGIC)
+    levelno, created, length = _HEADER.unpack_from(data, start)
+    start += _HEADER.size
+    name = data[start : start + length].decode("utf-8")
+    return RecordHeader(levelno, created, name), data[start + length :]
@@ -1,13 +1,20 @@
 import abc
+import collections.abc
 import datetime as dt
 import enum
+import functools
 import json
 import logging.config
 import uuid
 import warnings
 from typing import Any
 from typing import Callable
+from typing import cast
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Mapping
+from typing import Optional
 from typing import Tuple
 from typing import Type
 from typing import Union
@@ -16,7 +23,7 @@ from werkzeug.local import LocalProxy
 from werkzeug.useragents import UserAgent
 
 
-__all__ = ["JSONLogWarning", "JSONFormatter"]
+__all__ = ["JSONLogWarning", "JSONFormatter", "JSONBackend", "get_backend"]
 
 
 LOG_RECORD_SCHEMA: Dict[str, Tuple[str, ...]] = {
@@ -46,6 +53,10 @@ LOG_RECORD_SCHEMA: Dict[str, Tuple[str, ...]] = {
 }
 
 
+#: Suffix added to record attributes which are truncated by :class:`JSONFormatter`.
+TRUNCATION_MARKER = "...[truncated]"
+
+
 class JSONLogWarning(Warning):
     """Warning used when an unmarshallable type is being logged"""
 
@@ -59,34 +70,410 @@ class HasSchema(abc.ABC):
         return NotImplemented
 
 
+Converter = Callable[[Any], Any]
+ConverterKey = Union[Type, Tuple[Type, ...]]
+
+
+class _Converters(Dict[ConverterKey, Converter]):
+    """A dictionary of converters, which counts changes so that cached resolutions can be invalidated."""
+
+    version = 0
+
+    def __setitem__(self, key: ConverterKey, value: Converter) -> None:
+        super().__setitem__(key, value)
+        self.version += 1
+
+    def __delitem__(self, key: ConverterKey) -> None:
+        super().__delitem__(key)
+        self.version += 1
+
+    def clear(self) -> None:
+        super().clear()
+        self.version += 1
+
+    def pop(self, *args: Any) -> Any:
+        self.version += 1
+        return super().pop(*args)
+
+    def popitem(self) -> Tuple[ConverterKey, Converter]:
+        self.version += 1
+        return super().popitem()
+
+    def setdefault(self, key: ConverterKey, default: Any = None) -> Any:
+        self.version += 1
+        return super().setdefault(key, default)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self.version += 1
+
+
 class FlexJSONEncoder(json.JSONEncoder):
-    """Flexible JSON encoder for use with more JSON types"""
-
-    converters: Dict[Union[Type, Tuple[Type]], Callable[[Any], Any]] = {
-        dt.datetime: lambda value: value.isoformat(),
-        dt.date: lambda value: f"{value:%Y-%m-%d}",
-        HasSchema: lambda m: m.__schema__().dump(m),
-        uuid.UUID: str,
-        UserAgent: str,
-        enum.Enum: lambda value: value.name,
-        LocalProxy: repr,
-    }
+    """
+    Flexible JSON encoder for use with more JSON types
+
+    Converters are resolved from the concrete type of each object, preferring the most
+    specific class in its MRO, and falling back to abstract base classes and tuples of
+    types in the order they were registered. Resolutions are cached per type. New converters
+    can be added with :meth:`register`, or by changing :attr:`converters` directly, and either
+    invalidates the cache.
+    """
+
+    converters: Dict[ConverterKey, Converter] = _Converters(
+        {
+            dt.datetime: lambda value: value.isoformat(),
+            dt.date: lambda value: f"{value:%Y-%m-%d}",
+            HasSchema: lambda m: m.__schema__().dump(m),
+            uuid.UUID: str,
+            UserAgent: str,
+            enum.Enum: lambda value: value.name,
+            LocalProxy: repr,
+            collections.abc.Mapping: dict,
+        }
+    )
+
+    _dispatch_cache: Dict[Type, Optional[Converter]] = {}
+    _dispatch_stamp: Tuple[Any, int] = (None, 0)
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._dispatch_cache = {}
+        cls._dispatch_stamp = (None, 0)
+
+    @classmethod
+    def register(cls, types: ConverterKey, func: Optional[Converter] = None) -> Any:
+        """
+        Register a converter for a type, or a tuple of types.
+
+        Can be used directly, or as a decorator when `func` is omitted::
+
+            @FlexJSONEncoder.register(decimal.Decimal)
+            def convert_decimal(value):
+                return str(value)
+
+        """
+        if func is None:
+
+            def decorator(func: Converter) -> Converter:
+                cls.register(types, func)
+                return func
+
+            return decorator
+
+        if "converters" not in cls.__dict__:
+            # Don't modify the converters of a parent class.
+            cls.converters = _Converters(cls.converters)
+        cls.converters[types] = func
+        return func
+
+    @classmethod
+    def resolve(cls, type_: Type) -> Optional[Converter]:
+        """Find the converter for a type, or `None` if the type can't be converted."""
+        converters = cls.converters
+        # Converters may be changed in place, or replaced, e.g. with a plain dictionary.
+        version = getattr(converters, "version", None)
+        if version is None:
+            version = len(converters)
+        if cls._dispatch_stamp[0] is not converters or cls._dispatch_stamp[1] != version:
+            cls._dispatch_cache.clear()
+            cls._dispatch_stamp = (converters, version)
+
+        try:
+            return cls._dispatch_cache[type_]
+        except KeyError:
+            pass
+
+        converter = cls._find_converter(type_)
+        cls._dispatch_cache[type_] = converter
+        return converter
+
+    @classmethod
+    def _find_converter(cls, type_: Type) -> Optional[Converter]:
+        converters = cls.converters
+        for base in type_.__mro__:
+            if base in converters:
+                return converters[base]
+
+        for clses, func in converters.items():
+            if issubclass(type_, clses):
+                return func
+        return None
 
     def default(self, obj: Any) -> Any:
-        for clses, func in self.converters.items():
-            if isinstance(obj, clses):
-                return func(obj)
+        converter = self.resolve(type(obj))
+        if converter is not None:
+            return converter(obj)
+
+        warnings.warn(JSONLogWarning(f"Unable to marshal type {type(obj)} to JSON"))
+        return f"<Unecodeable type: {type(obj)!r} {obj!r}>"
+
+
+class JSONBackend(abc.ABC):
+    """
+    A serializer used to encode and decode JSON log records.
+
+    Backends must produce output which decodes to the same data as the standard
+    library encoder, and must apply the converters from :class:`FlexJSONEncoder`
+    to objects which are not natively supported.
+    """
+
+    name: str
+
+    @abc.abstractmethod
+    def dumps(self, data: Any, encoder: FlexJSONEncoder) -> str:
+        """Encode data as JSON, using `encoder` for key ordering and conversions."""
+
+    @abc.abstractmethod
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """Decode JSON data"""
+
+
+class StdlibJSONBackend(JSONBackend):
+    """JSON backend using the standard library :mod:`json` module."""
+
+    name = "json"
+
+    def dumps(self, data: Any, encoder: FlexJSONEncoder) -> str:
+        return encoder.encode(data)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonBackend(JSONBackend):
+    """
+    JSON backend using :mod:`orjson`.
+
+    Datetimes, dataclasses and subclasses of builtin types are passed through to the
+    :class:`FlexJSONEncoder` converters, so they are encoded the same way as the standard library backend.
+    Data which orjson can't handle (e.g. integers larger than 64 bits, or non-standard floats when
+    decoding) is encoded with the standard library instead.
+
+    orjson encodes :class:`enum.Enum` members by value and non-finite floats as ``null`` before any
+    converter is consulted, where the standard library backend uses the member name and ``Infinity``
+    or ``NaN``. Records are not searched for these values, as that would cost more than orjson saves.
+    """
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._orjson = orjson
+        self._options = (
+            orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_PASSTHROUGH_SUBCLASS
+            | orjson.OPT_NON_STR_KEYS
+        )
+
+    def dumps(self, data: Any, encoder: FlexJSONEncoder) -> str:
+        options = self._options
+        if encoder.sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+
+        def default(obj: Any) -> Any:
+            if isinstance(obj, enum.Enum):
+                return encoder.default(obj)
+            # Subclasses of types which the standard library handles natively, but orjson does not.
+            if isinstance(obj, str):
+                return str.__str__(obj)
+            if isinstance(obj, int):
+                return int(obj)
+            if isinstance(obj, float):
+                return float(obj)
+            if isinstance(obj, (list, tuple)):
+                return list(obj)
+            if isinstance(obj, dict):
+                return dict(obj)
+            return encoder.default(obj)
+
+        try:
+            return self._orjson.dumps(data, default=default, option=options).decode("utf-8")
+        except self._orjson.JSONEncodeError:
+            return encoder.encode(data)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            return json.loads(data)
+
+
+BACKENDS: Dict[str, Type[JSONBackend]] = {
+    StdlibJSONBackend.name: StdlibJSONBackend,
+    OrjsonBackend.name: OrjsonBackend,
+}
+
+#: Backends to try, in order, for the ``"auto"`` backend.
+AUTO_BACKENDS = ("orjson", "json")
+
+
+@functools.lru_cache()
+def get_backend(name: Optional[str] = None) -> JSONBackend:
+    """
+    Get a JSON backend by name.
+
+    When `name` is `None`, use the standard library. When `name` is ``"auto"``, use the first available
+    backend from :data:`AUTO_BACKENDS`, so that an accelerated encoder is used when one is installed.
+    """
+    if name is None:
+        name = StdlibJSONBackend.name
+
+    if name == "auto":
+        for candidate in AUTO_BACKENDS:
+            try:
+                return get_backend(candidate)
+            except ImportError:
+                continue
+        raise ImportError(f"No JSON backend is available from {AUTO_BACKENDS!r}")
+
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown JSON backend {name!r}, expected one of {sorted(BACKENDS)!r}") from None
+    return backend()
+
+
+SchemaNode = Tuple[Tuple[str, Any], ...]
+
+
+class SchemaPlan:
+    """
+    A precomputed plan for converting log record attributes into nested JSON data.
+
+    The plan resolves the nesting of each attribute in the schema once, and fixes the
+    order of the output keys, so that converting a record only requires a single pass
+    over the schema. Attributes which are not in the schema are placed at the top level,
+    after all of the schema attributes, in the order they appear on the record.
+
+    Parameters
+    ----------
+    schema: dict
+        Mapping of log record attribute names to their nested position in the output.
+    include: iterable of str, optional
+        If provided, only these record attributes are included in the output.
+    exclude: iterable of str, optional
+        Record attributes which are dropped from the output.
+
+    """
+
+    def __init__(
+        self,
+        schema: Mapping[str, Tuple[str, ...]],
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+    ) -> None:
+        self.schema = schema
+        self.include = frozenset(include) if include is not None else None
+        self.exclude = frozenset(exclude or ())
+        self.root = self._compile({key: position for key, position in schema.items() if self.allowed(key)})
+
+        # Attributes which can never appear as top-level extras.
+        self._ignored = frozenset(schema) | self.exclude
+        self._extras = None if self.include is None else tuple(sorted(self.include - self._ignored))
+
+    def allowed(self, key: str) -> bool:
+        """Whether a record attribute is included in the output"""
+        return key not in self.exclude and (self.include is None or key in self.include)
+
+    @staticmethod
+    def _compile(schema: Mapping[str, Tuple[str, ...]]) -> SchemaNode:
+        tree: Dict[str, Any] = {}
+        for key, position in schema.items():
+            *parents, target_key = position
+            target = tree
+            for parent in parents:
+                target = target.setdefault(parent, {})
+                if not isinstance(target, dict):
+                    raise ValueError(f"Schema position {position!r} for {key!r} conflicts with another attribute")
+            if target_key in target:
+                raise ValueError(f"Schema position {position!r} for {key!r} conflicts with another attribute")
+            target[target_key] = key
+
+        def freeze(node: Dict[str, Any]) -> SchemaNode:
+            return tuple((k, v if isinstance(v, str) else freeze(v)) for k, v in sorted(node.items()))
+
+        return freeze(tree)
+
+    def convert(self, raw: Mapping[str, Any]) -> Dict[str, Any]:
+        """Convert a mapping of record attributes into nested data following this plan"""
+        data = _apply_schema_node(self.root, raw)
+        if self._extras is not None:
+            for key in self._extras:
+                if key in raw:
+                    data[key] = raw[key]
+        else:
+            ignored = self._ignored
+            for key, value in raw.items():
+                if key not in ignored:
+                    data[key] = value
+        return data
+
+
+def _apply_schema_node(node: SchemaNode, raw: Mapping[str, Any]) -> Dict[str, Any]:
+    data: Dict[str, Any] = {}
+    for key, child in node:
+        if isinstance(child, str):
+            if child in raw:
+                data[key] = raw[child]
         else:
-            warnings.warn(JSONLogWarning(f"Unable to marshal type {type(obj)} to JSON"))
-            return f"<Unecodeable type: {type(obj)!r} {obj!r}>"
-        return super().default(obj)
+            value = _apply_schema_node(child, raw)
+            if value:
+                data[key] = value
+    return data
 
 
 class JSONFormatter(logging.Formatter):
     """
     Format log records as JSON
+
+    Parameters
+    ----------
+    fmt: str, optional
+        Format string, used only to format the message and exception text.
+    datefmt: str, optional
+        Date format string, used only to format the message and exception text.
+    style: str, optional
+        Style of the format string.
+    compiled: bool, optional
+        Use a precomputed plan of :data:`LOG_RECORD_SCHEMA` to build the nested output. The
+        output contains the same data, but keys are emitted in the fixed order of the plan
+        rather than sorted for each record. Defaults to ``False``.
+    backend: str or JSONBackend, optional
+        Name of the JSON backend used to encode records (see :func:`get_backend`). Defaults to
+        the standard library, or ``"auto"`` for the fastest available backend.
+    include: iterable of str, optional
+        Record attributes (e.g. ``levelname`` or an ``extra`` key) to include in the output. By
+        default, all attributes are included.
+    exclude: iterable of str, optional
+        Record attributes to drop from the output, e.g. ``["relativeCreated", "msecs"]``.
+    max_field_size: int, optional
+        Maximum size of a single record attribute, measured as characters of its JSON encoding.
+        Larger values are cut to this size and suffixed with :data:`TRUNCATION_MARKER`.
+
     """
 
+    def __init__(
+        self,
+        fmt: Optional[str] = None,
+        datefmt: Optional[str] = None,
+        style: str = "%",
+        compiled: bool = False,
+        backend: Union[None, str, JSONBackend] = None,
+        include: Optional[Iterable[str]] = None,
+        exclude: Optional[Iterable[str]] = None,
+        max_field_size: Optional[int] = None,
+    ) -> None:
+        super().__init__(fmt=fmt, datefmt=datefmt, style=style)  # type: ignore[arg-type]
+        self.compiled = compiled
+        self.backend = backend if isinstance(backend, JSONBackend) else get_backend(backend)
+        self.max_field_size = max_field_size
+        self._projection = SchemaPlan(LOG_RECORD_SCHEMA, include=include, exclude=exclude)
+        self._plan: Optional[SchemaPlan] = self._projection if compiled else None
+        self._projected = include is not None or bool(exclude)
+        self._encoder = FlexJSONEncoder(sort_keys=not compiled)
+
     def format(self, record: logging.LogRecord) -> str:
         """
         Format a record for output
@@ -95,15 +482,22 @@ class JSONFormatter(logging.Formatter):
         if ei:
             _ = super().format(record)  # just to get traceback text into record.exc_text
             record.exc_info = None  # to avoid Unpickleable error
-        s = json.dumps(self._convert_json_data(record), sort_keys=True, cls=FlexJSONEncoder)
+        s = self.backend.dumps(self._convert_json_data(record), self._encoder)
         if ei:
             record.exc_info = ei  # for next handler
         return s
 
     def _convert_json_data(self, record: logging.LogRecord) -> Dict[str, Any]:
+        raw: Dict[str, Any] = record.__dict__
+        if self.max_field_size is not None:
+            raw = self._truncate_fields(record, self._project(raw))
+
+        if self._plan is not None:
+            return self._plan.convert(raw)
+
         data: Dict[str, Any] = {}
 
-        raw = dict(record.__dict__)
+        raw = self._project(raw)
 
         for key, value in raw.items():
             *parents, target_key = LOG_RECORD_SCHEMA.get(key, (key,))
@@ -114,9 +508,55 @@ class JSONFormatter(logging.Formatter):
 
         return data
 
+    def _project(self, raw: Dict[str, Any]) -> Dict[str, Any]:
+        if not self._projected:
+            return dict(raw)
+        allowed = self._projection.allowed
+        return {key: value for key, value in raw.items() if allowed(key)}
+
+    def _truncate_fields(self, record: logging.LogRecord, raw: Dict[str, Any]) -> Dict[str, Any]:
+        limit = cast(int, self.max_field_size)
+        for key, value in list(raw.items()):
+            if value is None or isinstance(value, (bool, int, float)):
+                continue
+            if isinstance(value, str):
+                if len(value) > limit:
+                    raw[key] = value[:limit] + TRUNCATION_MARKER
+                continue
+
+            encoded = self.backend.dumps(value, self._encoder)
+            if len(encoded) > limit:
+                raw[key] = encoded[:limit] + TRUNCATION_MARKER
 
-def makeLogRecordfromJson(data: str) -> logging.LogRecord:
-    raw = json.loads(data)
+        args = raw.get("args")
+        if args and not isinstance(args, str) and "msg" in raw and raw["msg"] is not record.msg:
+            # The format string was truncated, so it can't be used with the arguments either.
+            encoded = self.backend.dumps(args, self._encoder)
+            raw["args"] = encoded[:limit] + TRUNCATION_MARKER
+
+        if isinstance(raw.get("args"), str) and "message" not in raw and self._projection.allowed("message"):
+            # Without the arguments, consumers can't render the message, so include it here.
+            message = record.getMessage()
+            raw["message"] = message if len(message) <= limit else message[:limit] + TRUNCATION_MARKER
+        return raw
+
+
+def _invert_schema_node(node: SchemaNode, data: Mapping[str, Any], recordinfo: Dict[str, Any]) -> None:
+    for key, child in node:
+        if key not in data:
+            continue
+        value = data[key]
+        if isinstance(child, str):
+            recordinfo[child] = value
+        elif isinstance(value, dict):
+            _invert_schema_node(child, value, recordinfo)
+
+
+#: Plan of :data:`LOG_RECORD_SCHEMA`, used to find record attributes in decoded JSON.
+_RECORD_PLAN = SchemaPlan(LOG_RECORD_SCHEMA)
+
+
+def _makeLogRecordfromData(raw: Dict[str, Any]) -> logging.LogRecord:
     recordinfo = {**raw}
 
     if isinstance(raw.get("message", None), dict):
@@ -126,23 +566,68 @@ def makeLogRecordfromJson(data: str) -> logging.LogRecord:
         else:
             raw["message_original"] = message
 
-    # This will duplicate standard keys – i.e. it doesn't
+    # This will duplicate standard keys – i.e. it doesn't
     # remove the nested ones, but thats probably fine?
-    for key, position in LOG_RECORD_SCHEMA.items():
-
-        *parents, target_key = position
-        target = raw
-        for parent in parents:
-            target = target.get(parent, {})
-
-        if target_key in target:
-            recordinfo[key] = target[target_key]
+    _invert_schema_node(_RECORD_PLAN.root, raw, recordinfo)
 
     if "args" in recordinfo and isinstance(recordinfo["args"], list):
         recordinfo["args"] = tuple(recordinfo["args"])
+    elif isinstance(recordinfo.get("args"), str):
+        # The arguments were truncated, so the message must be used as-is.
+        recordinfo["msg"] = recordinfo.get("message", recordinfo.get("msg"))
+        recordinfo["args"] = None
 
     if "message" in recordinfo and "msg" not in recordinfo:
         recordinfo["msg"] = recordinfo["message"]
         recordinfo["args"] = None
 
     return logging.makeLogRecord(recordinfo)
+
+
+def makeLogRecordfromJson(data: Union[str, bytes], backend: Optional[str] = None) -> logging.LogRecord:
+    """
+    Create a log record from JSON produced by :class:`JSONFormatter`.
+
+    Parameters
+    ----------
+    data: str or bytes
+        The JSON encoded log record.
+    backend: str, optional
+        Name of the JSON backend used to decode records (see :func:`get_backend`). Defaults to
+        the standard library, or ``"auto"`` for the fastest available backend.
+
+    """
+    return _makeLogRecordfromData(get_backend(backend).loads(data))
+
+
+def iterLogRecordsfromJson(
+    lines: Iterable[Union[str, bytes]], backend: Optional[str] = None
+) -> Iterator[logging.LogRecord]:
+    """
+    Create log records from newline-delimited JSON, one record per line.
+
+    Records are produced as the lines are read, so a file of any size can be decoded
+    in constant memory::
+
+        with open("records.ndjson", "rb") as f:
+            for record in iterLogRecordsfromJson(f):
+                logging.getLogger(record.name).handle(record)
+
+    Parameters
+    ----------
+    lines: iterable of str or bytes
+        The JSON encoded log records, e.g. an open file. Blank lines are skipped.
+    backend: str, optional
+        Name of the JSON backend used to decode records (see :func:`get_backend`). Defaults to
+        the standard library, or ``"auto"`` for the fastest available backend.
+
+    """
+    loads = get_backend(backend).loads
+    for lineno, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw = loads(line)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON log record on line {lineno}") from e
+        yield _makeLogRecordfromData(raw)
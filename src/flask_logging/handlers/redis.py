@@ -1,8 +1,23 @@
+import collections
+import enum
 import logging
+import os
+import queue
+import re
+import socket
+import threading
+import time
 import traceback
+from concurrent.futures import Executor
+from concurrent.futures import Future
 from typing import Any
 from typing import Callable
+from typing import Counter
+from typing import Deque
 from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
 from typing import Tuple
 from typing import TYPE_CHECKING
 from typing import Union
@@ -14,12 +29,95 @@ from urllib.parse import urlunparse
 if TYPE_CHECKING:
     import redis
 
+from .binary import makeLogRecordfromBinary
+from .framing import CODECS
+from .framing import add_header
+from .framing import encode_frame
+from .framing import HeaderFilter
+from .framing import split_header
+from .framing import unframe
 from .json import makeLogRecordfromJson
+from .spill import CircuitBreaker
+from .spill import Envelope
+from .spill import SpillFile
 
 ClientArgs = Union["redis.Redis", "redis.ConnectionPool", Tuple[str, int], str]
-Deserialize = Callable[[str], logging.LogRecord]
+LogLevel = Union[str, int]
+Message = Union[str, bytes]
+Deserialize = Callable[[bytes], logging.LogRecord]
 
-DESERIALIERS: Dict[str, Deserialize] = {"json": makeLogRecordfromJson}
+DESERIALIERS: Dict[str, Deserialize] = {"json": makeLogRecordfromJson, "binary": makeLogRecordfromBinary}
+
+
+DecodedBatch = List[Tuple[Optional[logging.LogRecord], Optional[str]]]
+
+
+def _deserialize_batch(
+    deserialize: Deserialize, payloads: List[Any], prefilter: Optional[HeaderFilter] = None
+) -> DecodedBatch:
+    """
+    Deserialize a batch of messages, returning each record or the error which prevented decoding it.
+
+    Records which don't match `prefilter` are skipped. Messages with a record header are skipped before
+    they are decoded.
+    """
+    results: DecodedBatch = []
+    for payload in payloads:
+        try:
+            messages = unframe(payload)
+        except Exception:
+            results.append((None, f"Error processing frame:\n{payload!r}\n{traceback.format_exc()}"))
+            continue
+
+        for message in messages:
+            try:
+                header, message = split_header(message)
+                if header is not None and prefilter is not None:
+                    if not prefilter.matches(header.levelno, header.name):
+                        continue
+                record = deserialize(message)
+            except Exception:
+                results.append((None, f"Error processing record:\n{message!r}\n{traceback.format_exc()}"))
+                continue
+
+            if header is None and prefilter is not None and not prefilter.matches(record.levelno, record.name):
+                continue
+            results.append((record, None))
+    return results
+
+
+# Clients created from URLs and (host, port) tuples are shared within each process, so that handlers
+# and watchers for the same Redis server share one connection pool.
+_clients: Dict[Union[str, Tuple[str, int]], "redis.Redis"] = {}
+_clients_lock = threading.Lock()
+
+
+def _reset_clients_after_fork() -> None:
+    """Reset shared connection pools in a forked child, which must not use its parent's connections."""
+    global _clients_lock
+    _clients_lock = threading.Lock()
+    for client in _clients.values():
+        client.connection_pool.reset()
+
+
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    os.register_at_fork(after_in_child=_reset_clients_after_fork)
+
+
+def _shared_client(address: Union[str, Tuple[str, int]]) -> "redis.Redis":
+    """Get the client for a URL or ``(host, port)``, shared with other handlers in this process."""
+    import redis
+
+    with _clients_lock:
+        client = _clients.get(address)
+        if client is None:
+            if isinstance(address, tuple):
+                host, port = address
+                client = redis.Redis(host, port, decode_responses=False)
+            else:
+                client = redis.Redis.from_url(address)
+            _clients[address] = client
+    return client
 
 
 def _handle_redis_client_args(args: ClientArgs) -> "redis.Redis":
@@ -32,49 +130,523 @@ def _handle_redis_client_args(args: ClientArgs) -> "redis.Redis":
         client = redis.Redis(connection_pool=args, decode_responses=False)
     elif isinstance(args, tuple):
         host, port = args
-        client = redis.Redis(host, port, decode_responses=False)
+        client = _shared_client((host, port))
     elif isinstance(args, str):
-        client = redis.Redis.from_url(args)
+        client = _shared_client(args)
     else:
         raise TypeError(f"Can't handle client arguments: {args!r}")
     return client
 
 
+#: Record attributes which can be used in channel templates.
+CHANNEL_FIELDS = frozenset(("name", "levelname", "levelno"))
+
+#: Largest number of batches of spilled messages replayed each time messages are published.
+REPLAY_BATCHES = 10
+
+#: The standard levels, in increasing order of severity.
+_LEVELS = (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL)
+
+
+_CHANNEL_FIELD = re.compile(r"\{(" + "|".join(sorted(CHANNEL_FIELDS)) + r")\}")
+
+
+def _is_channel_template(channel: str) -> bool:
+    """Check whether a channel is a template, i.e. it uses fields from :data:`CHANNEL_FIELDS`."""
+    return _CHANNEL_FIELD.search(channel) is not None
+
+
+def _format_channel(template: str, name: str, levelname: str, levelno: int) -> str:
+    """Fill in the fields of a channel template. Other text in braces, e.g. Redis Cluster hash tags, is left as is."""
+    fields = {"name": name, "levelname": levelname, "levelno": str(levelno)}
+    return _CHANNEL_FIELD.sub(lambda match: fields[match.group(1)], template)
+
+
+def level_channels(template: str, level: LogLevel = logging.NOTSET, name: str = "*") -> List[str]:
+    """
+    The channels from a channel template which carry records at or above a level.
+
+    Parameters
+    ----------
+    template: str
+        The channel template used by the publisher, e.g. ``"app:{levelname}"``.
+    level: int or str, optional
+        The lowest level to include. By default, all of the standard levels are included.
+    name: str, optional
+        Logger name used to fill in the ``{name}`` field of the template. Defaults to ``"*"``, which makes a
+        pattern for all loggers, to be used with :meth:`RedisLogWatcher.psubscribe`.
+
+    """
+    if isinstance(level, str):
+        level = getattr(logging, level.upper())
+    channels = []
+    for levelno in _LEVELS:
+        if levelno >= int(level):
+            channel = _format_channel(template, name, logging.getLevelName(levelno), levelno)
+            if channel not in channels:
+                channels.append(channel)
+    return channels
+
+
 class RedisPublisher(logging.Handler):
-    """A Redis publisher, which takes formatted log messages and publishes them to Redis."""
+    """
+    A Redis publisher, which takes formatted log messages and publishes them to Redis.
+
+    When a `spill` file is given, messages which can't be published because Redis is unreachable are
+    appended to the spill file instead. Spilled messages are replayed in order, before any newer messages,
+    when messages are published while Redis is reachable. Each publish replays at most :data:`REPLAY_BATCHES`
+    batches, so that a single record doesn't wait for a whole outage to be replayed, and newer messages are
+    spilled behind the rest until the replay catches up. A circuit breaker stops the publisher
+    from trying to reach Redis for `retry_interval` seconds after a connection failure, so that records
+    don't each wait for a connection timeout during an outage.
+
+    Parameters
+    ----------
+    address: redis client arguments
+        The redis client, connection pool, URL, or ``(host, port)`` to publish to. Clients created from a URL or
+        ``(host, port)`` are shared by all of the handlers and watchers in a process.
+    channel: str
+        The channel to publish messages on. The channel can be a template, where the ``{name}``, ``{levelname}``
+        and ``{levelno}`` fields are filled in from each record, e.g. ``"app:{levelname}"``, so that watchers
+        can subscribe only to the records they need (see :func:`level_channels`). Other text in braces, such as
+        a Redis Cluster hash tag like ``"{app}:logs"``, is left as it is.
+    compression: str, optional
+        Name of a codec from :data:`~flask_logging.handlers.framing.CODECS` used to compress messages into
+        frames, which watchers decompress transparently. By default, messages are published as they are formatted.
+    spill: SpillFile or str, optional
+        The spill file, or a path for one, used while Redis is unreachable. By default, records which can't be
+        published are lost.
+    retry_interval: float, optional
+        Time, in seconds, to wait after a connection failure before trying Redis again. Defaults to 5s.
+    header: bool, optional
+        Prefix each message with a small header holding the record's level, logger name and timestamp, so that
+        watchers with a `level` or `logger` filter can skip records without decoding them. Watchers from older
+        versions can't read these messages, so this is off by default.
 
-    def __init__(self, address: ClientArgs, channel: str):
+    """
+
+    def __init__(
+        self,
+        address: ClientArgs,
+        channel: str,
+        compression: Optional[str] = None,
+        spill: Union[SpillFile, str, None] = None,
+        retry_interval: float = 5.0,
+        header: bool = False,
+    ) -> None:
         super().__init__()
         self.client = _handle_redis_client_args(address)
         self.channel = channel
+        self._templated = _is_channel_template(channel)
+        self._channels: Dict[Tuple[int, str], str] = {}
+        if compression is not None and compression not in CODECS:
+            raise ValueError(f"Unknown compression codec {compression!r}, expected one of {sorted(CODECS)!r}")
+        self.compression = compression
+        if isinstance(spill, str):
+            spill = SpillFile(spill)
+        self.spill = spill
+        self.breaker = CircuitBreaker(reset_timeout=retry_interval)
+        self.header = header
 
     def emit(self, record: logging.LogRecord) -> None:
         """Emit a single record."""
         try:
-            msg = self.format(record)
-            self.client.publish(self.channel, msg)
+            msg = self._format(record)
+            self._publish([(self.channel_for(record), msg)])
             self.flush()
         except (KeyboardInterrupt, SystemExit):
             raise
         except BaseException:
             self.handleError(record)
 
+    def _format(self, record: logging.LogRecord) -> Message:
+        """Format a record as a message, with a record header if enabled."""
+        msg = self.format(record)
+        if self.header:
+            return add_header(msg, record.levelno, record.name, record.created)
+        return msg
+
+    def channel_for(self, record: logging.LogRecord) -> str:
+        """The channel which a record is published on."""
+        if not self._templated:
+            return self.channel
+
+        key = (record.levelno, record.name)
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = _format_channel(self.channel, record.name, record.levelname, record.levelno)
+            self._channels[key] = channel
+        return channel
+
+    def _publish(self, messages: Sequence[Envelope]) -> None:
+        """Publish ``(channel, message)`` pairs, or spill them to disk if Redis is unreachable."""
+        if self.spill is None:
+            self._publish_now(messages)
+            return
+
+        if not self.breaker.allow():
+            self.spill.append(messages)
+            return
+
+        import redis
+
+        try:
+            if self.spill.pending:
+                self.spill.replay(self._publish_now, max_batches=REPLAY_BATCHES)
+            if self.spill.pending:
+                # Keep the order: these are sent after the rest of the spilled messages.
+                self.spill.append(messages)
+            else:
+                self._publish_now(messages)
+        except (redis.ConnectionError, redis.TimeoutError):
+            self.breaker.record_failure()
+            self.spill.append(messages)
+        else:
+            self.breaker.record_success()
+
+    def _publish_now(self, messages: Sequence[Envelope]) -> None:
+        """Publish ``(channel, message)`` pairs to Redis, with a pipeline when there are several."""
+        if self.compression is not None:
+            # Compress the messages for each channel into a single frame.
+            frames: Dict[str, List[Message]] = {}
+            for channel, msg in messages:
+                frames.setdefault(channel, []).append(msg)
+            messages = [(channel, encode_frame(frame, self.compression)) for channel, frame in frames.items()]
+
+        if len(messages) == 1:
+            channel, msg = messages[0]
+            self._send(self.client, channel, msg)
+        else:
+            pipeline = self.client.pipeline(transaction=False)
+            for channel, msg in messages:
+                self._send(pipeline, channel, msg)
+            pipeline.execute()
+
+    def _send(self, client: "redis.Redis", channel: str, msg: Message) -> None:
+        """Send a single message with a redis client or pipeline."""
+        client.publish(channel, msg)
+
+
+class OverflowPolicy(enum.Enum):
+    """What a :class:`BufferedRedisPublisher` does with a new record when its queue is full."""
+
+    #: Drop the new record.
+    DROP_NEWEST = "drop_newest"
+
+    #: Drop the oldest queued record to make room for the new record.
+    DROP_OLDEST = "drop_oldest"
+
+    #: Drop the new record if it is below the overflow level, otherwise drop the oldest queued record.
+    DROP_BELOW_LEVEL = "drop_below_level"
+
+
+class BufferedRedisPublisher(RedisPublisher):
+    """
+    A Redis publisher which queues formatted log messages, and publishes them in batches from a background thread.
+
+    Batches are sent through a single Redis pipeline, when either `batch_size` messages are waiting, or when the
+    oldest message has waited for `flush_interval` seconds. Closing the handler (e.g. via :func:`logging.shutdown`)
+    publishes any remaining messages.
+
+    Parameters
+    ----------
+    address: redis client arguments
+        The redis client, connection pool, URL, or ``(host, port)`` to publish to.
+    channel: str
+        The channel to publish messages on.
+    batch_size: int, optional
+        Number of queued messages which triggers a flush. Defaults to 100.
+    flush_interval: float, optional
+        Longest time, in seconds, which a message will be queued before it is published. Defaults to 0.1s.
+    max_queue_size: int, optional
+        Maximum number of queued messages. When the queue is full, `overflow` decides which record is dropped,
+        so that :meth:`emit` never waits for Redis. By default, the queue is unbounded.
+    overflow: OverflowPolicy or str, optional
+        Policy used when the queue is full. Defaults to dropping the newest record.
+    overflow_level: int or str, optional
+        Records below this level are dropped by :attr:`OverflowPolicy.DROP_BELOW_LEVEL`. Defaults to WARNING.
+    compression: str, optional
+        Name of a codec from :data:`~flask_logging.handlers.framing.CODECS`. When set, each batch is compressed
+        into a single frame, and published as one message.
+    spill: SpillFile or str, optional
+        The spill file, or a path for one, used while Redis is unreachable (see :class:`RedisPublisher`).
+    retry_interval: float, optional
+        Time, in seconds, to wait after a connection failure before trying Redis again. Defaults to 5s.
+    header: bool, optional
+        Prefix each message with a record header (see :class:`RedisPublisher`).
+
+    Attributes
+    ----------
+    dropped: collections.Counter
+        Number of records which were dropped, by reason: ``"newest"`` and ``"oldest"`` for records dropped
+        from a full queue, ``"level"`` for records dropped for their level, and ``"error"`` for records which
+        could not be published.
+
+    """
+
+    def __init__(
+        self,
+        address: ClientArgs,
+        channel: str,
+        batch_size: int = 100,
+        flush_interval: float = 0.1,
+        max_queue_size: Optional[int] = None,
+        overflow: Union[OverflowPolicy, str] = OverflowPolicy.DROP_NEWEST,
+        overflow_level: LogLevel = logging.WARNING,
+        compression: Optional[str] = None,
+        spill: Union[SpillFile, str, None] = None,
+        retry_interval: float = 5.0,
+        header: bool = False,
+    ) -> None:
+        super().__init__(
+            address, channel, compression=compression, spill=spill, retry_interval=retry_interval, header=header
+        )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.overflow = OverflowPolicy(overflow)
+        if isinstance(overflow_level, str):
+            overflow_level = getattr(logging, overflow_level.upper())
+        self.overflow_level = int(overflow_level)
+        self.dropped: Counter[str] = collections.Counter()
+        self._queue: Deque[Tuple[logging.LogRecord, Message]] = collections.deque()
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._idle = False
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def _ensure_thread(self) -> None:
+        # The background thread doesn't survive a fork, so start it lazily in each process.
+        if self._pid == os.getpid():
+            return
+        with self._condition:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name=f"{self.__class__.__name__}-flusher", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _make_room(self, record: logging.LogRecord) -> bool:
+        """Apply the overflow policy to a full queue, returning whether the new record should be queued."""
+        if self.overflow is OverflowPolicy.DROP_NEWEST:
+            self.dropped["newest"] += 1
+            return False
+        if self.overflow is OverflowPolicy.DROP_BELOW_LEVEL and record.levelno < self.overflow_level:
+            self.dropped["level"] += 1
+            return False
+
+        try:
+            self._queue.popleft()
+        except IndexError:
+            pass
+        else:
+            self.dropped["oldest"] += 1
+        return True
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Format a record and queue it to be published."""
+        if self.max_queue_size is not None and len(self._queue) >= self.max_queue_size:
+            if not self._make_room(record):
+                return
+
+        try:
+            msg = self._format(record)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException:
+            self.handleError(record)
+            return
+
+        self._ensure_thread()
+        self._queue.append((record, msg))
+        if self._idle or len(self._queue) >= self.batch_size:
+            with self._condition:
+                self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                # The idle flag is set before checking the queue, so that emit() either sees the flag
+                # and wakes this thread, or appended its message before the queue was checked.
+                self._idle = True
+                while not self._closed and not self._queue:
+                    self._condition.wait()
+                self._idle = False
+                if not self._closed and len(self._queue) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+            self.flush()
+            if closed:
+                break
+
+    def flush(self) -> None:
+        """Publish all queued messages."""
+        with self._flush_lock:
+            while self._queue:
+                batch: List[Tuple[logging.LogRecord, Message]] = []
+                while self._queue and len(batch) < self.batch_size:
+                    batch.append(self._queue.popleft())
+                self._publish_batch(batch)
+
+    def _publish_batch(self, batch: List[Tuple[logging.LogRecord, Message]]) -> None:
+        try:
+            self._publish([(self.channel_for(record), msg) for record, msg in batch])
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException:
+            self.dropped["error"] += len(batch)
+            self.handleError(batch[0][0])
+
+    def close(self) -> None:
+        """Stop the background thread and publish any remaining messages."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+        self.flush()
+        super().close()
+
+
+class RedisStreamPublisher(RedisPublisher):
+    """
+    A Redis publisher which adds formatted log messages to a Redis stream.
+
+    Unlike pub/sub channels, streams keep messages until they are trimmed, so watchers in a consumer group
+    (see :class:`RedisStreamWatcher`) can share the work of a busy stream, and can catch up after a restart.
+
+    Parameters
+    ----------
+    address: redis client arguments
+        The redis client, connection pool, URL, or ``(host, port)`` to publish to.
+    stream: str
+        The key of the stream to add messages to.
+    maxlen: int, optional
+        Trim the stream to about this many messages (see `approximate`). Set to `None` to never trim the stream,
+        which is not recommended. Defaults to 10,000.
+    approximate: bool, optional
+        Use approximate trimming (``MAXLEN ~``), which is much cheaper for Redis. Defaults to `True`.
+    field: str, optional
+        Name of the stream entry field which holds the message. Defaults to ``"data"``.
+    compression: str, optional
+        Name of a codec from :data:`~flask_logging.handlers.framing.CODECS` used to compress messages.
+    spill: SpillFile or str, optional
+        The spill file, or a path for one, used while Redis is unreachable (see :class:`RedisPublisher`).
+    retry_interval: float, optional
+        Time, in seconds, to wait after a connection failure before trying Redis again. Defaults to 5s.
+    header: bool, optional
+        Prefix each message with a record header (see :class:`RedisPublisher`).
+
+    """
+
+    def __init__(
+        self,
+        address: ClientArgs,
+        stream: str,
+        maxlen: Optional[int] = 10000,
+        approximate: bool = True,
+        field: str = "data",
+        compression: Optional[str] = None,
+        spill: Union[SpillFile, str, None] = None,
+        retry_interval: float = 5.0,
+        header: bool = False,
+    ) -> None:
+        super().__init__(
+            address, stream, compression=compression, spill=spill, retry_interval=retry_interval, header=header
+        )
+        self.maxlen = maxlen
+        self.approximate = approximate
+        self.field = field
+
+    @property
+    def stream(self) -> str:
+        return self.channel
+
+    def _send(self, client: "redis.Redis", channel: str, msg: Message) -> None:
+        client.xadd(channel, {self.field: msg}, maxlen=self.maxlen, approximate=self.approximate)
+
 
 class RedisLogWatcher:
-    """Watch a Redis channel for logging"""
+    """
+    Watch a Redis channel for logging
+
+    The watcher thread waits on the pub/sub connection until data arrives, and then handles all of the
+    messages which are available as one batch.
+
+    When publishers use a channel template, watchers can subscribe to only the channels they need, or to
+    patterns of channels, so that they don't receive and decode every record::
+
+        watcher = RedisLogWatcher(url, "app:*", makeLogRecordfromJson, pattern=True)
+        for channel in level_channels("app:{levelname}", "WARNING"):
+            watcher.subscribe(channel)
+
+    Watchers can also filter records by `level` and `logger`. When publishers add record headers (see
+    :class:`RedisPublisher`), records which don't match are skipped without being decoded.
+
+    Parameters
+    ----------
+    address: redis client arguments
+        The redis client, connection pool, URL, or ``(host, port)`` to read from. Clients created from a URL or
+        ``(host, port)`` are shared by all of the handlers and watchers in a process.
+    channel: str
+        The channel to subscribe to.
+    deserialize: callable
+        Function to turn messages into log records.
+    timeout: float, optional
+        Longest time, in seconds, for the watcher thread to wait for data before waking up. By default, the
+        thread only wakes up when data arrives, or when it is stopped.
+    executor: concurrent.futures.Executor, optional
+        Pool of workers used to deserialize messages in parallel, e.g. a
+        :class:`~concurrent.futures.ProcessPoolExecutor`. When a process pool is used, `deserialize` must be
+        picklable. Records are still handled in the order they were received, on a single dispatch thread.
+    decode_batch_size: int, optional
+        Largest number of messages sent to a worker at once. Defaults to 64.
+    pattern: bool, optional
+        Treat `channel` as a glob-style pattern, and subscribe to all of the matching channels.
+    level: int or str, optional
+        Only handle records at or above this level.
+    logger: str, optional
+        Only handle records from this logger, and its descendants.
 
-    thread = None
+    """
+
+    thread: Optional[threading.Thread] = None
+    dispatcher: Optional[threading.Thread] = None
+
+    #: Largest number of decoded batches waiting to be handled, before the watcher stops reading from Redis.
+    max_pending_batches = 64
 
     def __init__(
         self,
         address: ClientArgs,
         channel: str,
         deserialize: Deserialize,
+        timeout: Optional[float] = None,
+        executor: Optional[Executor] = None,
+        decode_batch_size: int = 64,
+        pattern: bool = False,
+        level: Optional[LogLevel] = None,
+        logger: Optional[str] = None,
     ) -> None:
         super().__init__()
         self.pubsub = _handle_redis_client_args(address).pubsub()
-        self.subscribe(channel)
+        if pattern:
+            self.psubscribe(channel)
+        else:
+            self.subscribe(channel)
         self.deserialize = deserialize
+        self.timeout = timeout
+        self.executor = executor
+        self.decode_batch_size = decode_batch_size
+        self.prefilter: Optional[HeaderFilter] = None
+        if level is not None or logger:
+            if isinstance(level, str):
+                level = getattr(logging, level.upper())
+            self.prefilter = HeaderFilter(int(level or 0), logger or "")
+        self._stopped = threading.Event()
+        self._decoded: "queue.Queue[Optional[Future[DecodedBatch]]]" = queue.Queue(self.max_pending_batches)
 
     @classmethod
     def from_url(cls, url: str) -> "RedisLogWatcher":
@@ -83,54 +655,157 @@ class RedisLogWatcher:
         # Get the options out of the URL
         result = urlparse(url)
         options = parse_qs(result.query)
-        channel = options.pop("channel", "")
-        format = options.pop("format", "json")
-        if isinstance(format, list):
-            raise TypeError(f"Multiple formats provided in URL: {format!r}")
+        channels = options.pop("channel", [])
+        patterns = options.pop("pattern", [])
+        formats = options.pop("format", ["json"])
+        if len(formats) > 1:
+            raise TypeError(f"Multiple formats provided in URL: {formats!r}")
+        level = options.pop("level", [None])[-1]
+        logger = options.pop("logger", [None])[-1]
 
-        deserialize = DESERIALIERS[format]
+        deserialize = DESERIALIERS[formats[0]]
 
         # Rebuild the URL without the query string.
         args = list(result)
         if "db" in options:
-            args[4] = urlencode(options)
+            args[4] = urlencode(options, doseq=True)
         else:
             args[4] = ""
         url = urlunparse(args)
 
         # Set up the object.
-        if isinstance(channel, list):
-            channel, *rest = channel
-            obj = cls(url, channel, deserialize)
-            for channel in rest:
-                obj.subscribe(channel)
+        if channels or not patterns:
+            channel, *rest = channels or [""]
+            obj = cls(url, channel, deserialize, level=level, logger=logger)
         else:
-            obj = cls(url, channel, deserialize)
+            channel, *patterns = patterns
+            obj = cls(url, channel, deserialize, pattern=True, level=level, logger=logger)
+            rest = []
+
+        for channel in rest:
+            obj.subscribe(channel)
+        for pattern in patterns:
+            obj.psubscribe(pattern)
         return obj
 
     def process_message(self, msg: Dict[str, Any]) -> None:
-        """Given a Redis message, create the logrecord and handle it."""
-        try:
-            record = self.deserialize(msg["data"])
-        except Exception:
-            logging.getLogger("error").exception(
-                f"Error processing record:\n{msg['data']!r}\n{traceback.format_exc()}", exc_info=True
-            )
-        else:
-            logging.getLogger(record.name).handle(record)
+        """Given a Redis message, create the logrecords it contains and handle them."""
+        self._dispatch_batch(_deserialize_batch(self.deserialize, [msg["data"]], self.prefilter))
 
     def subscribe(self, name: str) -> None:
         """Subscribe to an addtional channel."""
         self.pubsub.subscribe(**{name: self.process_message})
 
+    def psubscribe(self, pattern: str) -> None:
+        """Subscribe to all of the channels which match a glob-style pattern."""
+        self.pubsub.psubscribe(**{pattern: self.process_message})
+
+    def receive(self, timeout: Optional[float] = 0.0) -> List[Any]:
+        """
+        Wait for data on the pub/sub connection, and return all of the responses which are available.
+
+        Parameters
+        ----------
+        timeout: float, optional
+            Longest time, in seconds, to wait for the first response. `None` waits indefinitely.
+
+        """
+        responses = []
+        response = self.pubsub.parse_response(block=False, timeout=timeout)  # type: ignore
+        while response is not None:
+            responses.append(response)
+            response = self.pubsub.parse_response(block=False, timeout=0)
+        return responses
+
+    def process_responses(self, responses: List[Any]) -> None:
+        """Handle a batch of raw pub/sub responses, dispatching messages to :meth:`process_message`."""
+        if self.executor is None:
+            for response in responses:
+                self.pubsub.handle_message(response, ignore_subscribe_messages=True)
+            return
+
+        payloads = []
+        for response in responses:
+            kind = response[0]
+            if isinstance(kind, bytes):
+                kind = kind.decode("utf-8")
+            if kind == "message":
+                payloads.append(response[2])
+            elif kind == "pmessage":
+                payloads.append(response[3])
+            else:
+                self.pubsub.handle_message(response, ignore_subscribe_messages=True)
+
+        for start in range(0, len(payloads), self.decode_batch_size):
+            batch = payloads[start : start + self.decode_batch_size]
+            future = self.executor.submit(_deserialize_batch, self.deserialize, batch, self.prefilter)
+            if self.dispatcher is not None:
+                self._decoded.put(future)
+            else:
+                self._dispatch(future)
+
+    def _dispatch(self, future: "Future[DecodedBatch]") -> None:
+        try:
+            results = future.result()
+        except Exception:
+            logging.getLogger("error").exception("Error deserializing a batch of records")
+            return
+        self._dispatch_batch(results)
+
+    def _dispatch_batch(self, results: DecodedBatch) -> None:
+        for record, error in results:
+            if record is not None:
+                logging.getLogger(record.name).handle(record)
+            else:
+                logging.getLogger("error").error(error)
+
+    def _run_dispatcher(self) -> None:
+        while True:
+            future = self._decoded.get()
+            if future is None:
+                break
+            self._dispatch(future)
+
+    def _run(self) -> None:
+        try:
+            while not self._stopped.is_set():
+                try:
+                    self.process_responses(self.receive(timeout=self.timeout))
+                except Exception:
+                    if self._stopped.is_set():
+                        break
+                    logging.getLogger("error").exception("Error reading from redis pub/sub")
+                    self._stopped.wait(1.0)
+        finally:
+            self.pubsub.close()
+            if self.dispatcher is not None:
+                self._decoded.put(None)
+
     def start(self) -> None:
         """Start the log watcher."""
-        self.thread = self.pubsub.run_in_thread(sleep_time=0.01)
+        self._stopped.clear()
+        if self.executor is not None:
+            self.dispatcher = threading.Thread(
+                target=self._run_dispatcher, name=f"{self.__class__.__name__}-dispatcher", daemon=True
+            )
+            self.dispatcher.start()
+        self.thread = threading.Thread(target=self._run, name=f"{self.__class__.__name__}", daemon=True)
+        self.thread.start()
 
     def stop(self) -> None:
         """Stop the log watcher"""
+        self._stopped.set()
         if self.thread is not None:
-            self.thread.stop()
+            try:
+                # Wake the watcher thread, which is waiting for data.
+                self.pubsub.ping()
+            except Exception:
+                pass
+            self.thread.join()
+            self.thread = None
+        if self.dispatcher is not None:
+            self.dispatcher.join()
+            self.dispatcher = None
 
     def __enter__(self) -> "RedisLogWatcher":
         self.start()
@@ -138,3 +813,232 @@ class RedisLogWatcher:
 
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
         self.stop()
+
+
+def _next_stream_id(entry_id: Union[str, bytes]) -> str:
+    """The smallest stream entry id after `entry_id`, for paging without exclusive ranges."""
+    if isinstance(entry_id, bytes):
+        entry_id = entry_id.decode("utf-8")
+    milliseconds, sequence = entry_id.split("-")
+    return f"{milliseconds}-{int(sequence) + 1}"
+
+
+class RedisStreamWatcher:
+    """
+    Watch Redis streams for logging, as a member of a consumer group.
+
+    Each record in the stream is delivered to one watcher in the group, and is acknowledged once it has been
+    handled. When the watcher starts, it first handles records which were delivered to this consumer, but were never
+    acknowledged, so a watcher which restarts with the same consumer name will not lose records. Records which were
+    delivered to any consumer, but not acknowledged for `claim_idle` seconds, e.g. because that consumer's process
+    exited, are claimed and handled by this watcher. It looks for them when it starts polling, and again every
+    `claim_idle` seconds.
+
+    Parameters
+    ----------
+    address: redis client arguments
+        The redis client, connection pool, URL, or ``(host, port)`` to read from.
+    stream: str
+        The key of the stream to read.
+    deserialize: callable
+        Function to turn messages into log records.
+    group: str, optional
+        Name of the consumer group, which is created if it does not exist. Defaults to ``"flask-logging"``.
+    consumer: str, optional
+        Name of this consumer within the group. Defaults to the hostname and process id. Use a stable name to
+        recover records which were delivered, but not handled, before a restart, without waiting for `claim_idle`.
+    block: float, optional
+        Longest time, in seconds, to wait for new records in each read. Defaults to 1s.
+    count: int, optional
+        Largest number of records to read at once from each stream. Defaults to 100.
+    field: str, optional
+        Name of the stream entry field which holds the message. Defaults to ``"data"``.
+    claim_idle: float, optional
+        Time, in seconds, after which records which another consumer has not acknowledged are claimed by this
+        watcher. Defaults to 60s. Set to `None` to never claim records from other consumers.
+
+    """
+
+    thread: Optional[threading.Thread] = None
+
+    def __init__(
+        self,
+        address: ClientArgs,
+        stream: str,
+        deserialize: Deserialize,
+        group: str = "flask-logging",
+        consumer: Optional[str] = None,
+        block: float = 1.0,
+        count: int = 100,
+        field: str = "data",
+        claim_idle: Optional[float] = 60.0,
+    ) -> None:
+        super().__init__()
+        self.client = _handle_redis_client_args(address)
+        self.deserialize = deserialize
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.block = block
+        self.count = count
+        self.field = field
+        self.claim_idle = claim_idle
+        self.streams: Dict[str, str] = {}
+        self._claimed_at: Optional[float] = None
+        self._stopped = threading.Event()
+        self.subscribe(stream)
+
+    def subscribe(self, stream: str) -> None:
+        """Read from an additional stream, creating the consumer group if necessary."""
+        import redis
+
+        try:
+            self.client.xgroup_create(stream, self.group, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        # Start with any records which were delivered to this consumer, but never acknowledged.
+        self.streams[stream] = "0"
+
+    def process_message(self, fields: Optional[Dict[Any, Any]]) -> None:
+        """Given the fields of a stream entry, create the logrecord and handle it."""
+        if not fields:
+            # The entry was trimmed from the stream before it was acknowledged.
+            return
+        data = fields.get(self.field.encode("utf-8"), fields.get(self.field, b""))
+        for record, error in _deserialize_batch(self.deserialize, [data]):
+            if record is not None:
+                logging.getLogger(record.name).handle(record)
+            else:
+                logging.getLogger("error").error(error)
+
+    def poll(self, block: Optional[float] = None) -> int:
+        """
+        Read, handle and acknowledge a batch of records.
+
+        Records which other consumers have left unacknowledged for `claim_idle` seconds are claimed first, on
+        the first poll and then at most once every `claim_idle` seconds (see :meth:`claim`).
+
+        Parameters
+        ----------
+        block: float, optional
+            Longest time, in seconds, to wait for new records. By default, returns immediately.
+
+        Returns
+        -------
+        count: int
+            The number of records which were read.
+
+        """
+        total = 0
+        if self.claim_idle is not None and (
+            self._claimed_at is None or time.monotonic() - self._claimed_at >= self.claim_idle
+        ):
+            total += self.claim(self.claim_idle)
+
+        timeout = int(block * 1000) if block else None
+        response = self.client.xreadgroup(
+            self.group, self.consumer, dict(self.streams), count=self.count, block=timeout
+        )
+
+        for stream, entries in response or []:
+            if isinstance(stream, bytes):
+                stream = stream.decode("utf-8")
+
+            pending = self.streams[stream] != ">"
+            if pending and not entries:
+                # All of the unacknowledged records have been handled, move on to new records.
+                self.streams[stream] = ">"
+                continue
+
+            ids = self._handle_entries(stream, entries)
+            if pending:
+                self.streams[stream] = ids[-1]
+            total += len(ids)
+        return total
+
+    def claim(self, min_idle: float) -> int:
+        """
+        Claim, handle and acknowledge records which were delivered to a consumer in the group, but have not been
+        acknowledged for `min_idle` seconds.
+
+        Uses ``XAUTOCLAIM``, or ``XPENDING`` and ``XCLAIM`` for Redis servers older than 6.2. Returns the number of
+        records which were claimed.
+        """
+        import redis
+
+        min_idle_time = int(min_idle * 1000)
+        total = 0
+        for stream in list(self.streams):
+            try:
+                total += self._autoclaim(stream, min_idle_time)
+            except redis.ResponseError as e:
+                if "unknown command" not in str(e).lower():
+                    raise
+                total += self._claim_pending(stream, min_idle_time)
+        self._claimed_at = time.monotonic()
+        return total
+
+    def _autoclaim(self, stream: str, min_idle_time: int) -> int:
+        total = 0
+        start: Any = "0-0"
+        while True:
+            response = self.client.xautoclaim(
+                stream, self.group, self.consumer, min_idle_time, start_id=start, count=self.count
+            )
+            start, entries = response[0], response[1]
+            if entries:
+                total += len(self._handle_entries(stream, entries))
+            if start in (b"0-0", "0-0"):
+                return total
+
+    def _claim_pending(self, stream: str, min_idle_time: int) -> int:
+        total = 0
+        start: Any = "-"
+        while True:
+            pending = self.client.xpending_range(stream, self.group, min=start, max="+", count=self.count)
+            ids = [entry["message_id"] for entry in pending if entry["time_since_delivered"] >= min_idle_time]
+            if ids:
+                entries = self.client.xclaim(stream, self.group, self.consumer, min_idle_time, ids)
+                if entries:
+                    total += len(self._handle_entries(stream, entries))
+            if len(pending) < self.count:
+                return total
+            start = _next_stream_id(pending[-1]["message_id"])
+
+    def _handle_entries(self, stream: str, entries: List[Tuple[Any, Any]]) -> List[Any]:
+        """Handle stream entries, then acknowledge them, returning their ids."""
+        ids = []
+        for entry_id, fields in entries:
+            self.process_message(fields)
+            ids.append(entry_id)
+        self.client.xack(stream, self.group, *ids)
+        return ids
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self.poll(block=self.block)
+            except Exception:
+                logging.getLogger("error").exception("Error reading from redis streams")
+                self._stopped.wait(self.block)
+
+    def start(self) -> None:
+        """Start the log watcher."""
+        self._stopped.clear()
+        self.thread = threading.Thread(target=self._run, name=f"{self.__class__.__name__}", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop the log watcher"""
+        self._stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self) -> "RedisStreamWatcher":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.stop()
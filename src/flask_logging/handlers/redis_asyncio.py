@@ -0,0 +1,270 @@
+"""
+Asyncio variants of the Redis log publisher and watcher.
+
+These require a version of redis-py which provides :mod:`redis.asyncio` (4.2 or later).
+"""
+import asyncio
+import collections
+import logging
+import threading
+import traceback
+from typing import Any
+from typing import AsyncIterator
+from typing import Counter
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import TYPE_CHECKING
+from typing import Union
+
+from .framing import split_header
+from .framing import unframe
+from .redis import Deserialize
+
+if TYPE_CHECKING:
+    import redis.asyncio
+
+__all__ = ["AsyncRedisPublisher", "AsyncRedisLogWatcher"]
+
+AsyncClientArgs = Union["redis.asyncio.Redis", "redis.asyncio.ConnectionPool", Tuple[str, int], str]
+
+
+def _handle_async_redis_client_args(args: AsyncClientArgs) -> "redis.asyncio.Redis":
+    """Handle arguments that should produce an asyncio REDIS client."""
+    try:
+        import redis.asyncio
+    except ImportError as e:  # pragma: nocover
+        raise ImportError("The asyncio redis handlers require redis-py 4.2 or later") from e
+
+    if isinstance(args, redis.asyncio.Redis):
+        client: "redis.asyncio.Redis" = args
+    elif isinstance(args, redis.asyncio.ConnectionPool):
+        client = redis.asyncio.Redis(connection_pool=args, decode_responses=False)
+    elif isinstance(args, tuple):
+        host, port = args
+        client = redis.asyncio.Redis(host=host, port=port, decode_responses=False)
+    elif isinstance(args, str):
+        client = redis.asyncio.Redis.from_url(args)
+    else:
+        raise TypeError(f"Can't handle client arguments: {args!r}")
+    return client
+
+
+def _owns_async_redis_client(args: AsyncClientArgs) -> bool:
+    """Whether the client for these arguments is created by :func:`_handle_async_redis_client_args` alone."""
+    return isinstance(args, (tuple, str))
+
+
+class AsyncRedisPublisher(logging.Handler):
+    """
+    A Redis publisher for asyncio applications.
+
+    Records can be published directly with ``await publisher.publish(record)``, which waits for Redis and so
+    applies backpressure to the caller. When used as a logging handler, :meth:`emit` queues formatted messages
+    for a task on the event loop, which publishes them in batches through a pipeline. :meth:`emit` never waits:
+    when the queue is full, the new record is dropped and counted in :attr:`dropped`.
+
+    The publishing task runs between :meth:`start` and :meth:`aclose`, or inside an ``async with`` block::
+
+        async with AsyncRedisPublisher(url, "my-channel") as handler:
+            logger.addHandler(handler)
+            ...
+
+    Parameters
+    ----------
+    address: redis client arguments
+        The asyncio redis client, connection pool, URL, or ``(host, port)`` to publish to. A client created from a
+        URL or ``(host, port)`` is closed by :meth:`aclose`, while a client or pool which is passed in is left open.
+    channel: str
+        The channel to publish messages on.
+    max_queue_size: int, optional
+        Maximum number of messages waiting to be published. Defaults to 10,000.
+
+    Attributes
+    ----------
+    dropped: collections.Counter
+        Number of records which were dropped, by reason: ``"newest"`` for records dropped from a full queue,
+        ``"stopped"`` for records emitted when the publishing task is not running, and ``"error"`` for records
+        which could not be published.
+
+    """
+
+    def __init__(self, address: AsyncClientArgs, channel: str, max_queue_size: int = 10000) -> None:
+        super().__init__()
+        self.client = _handle_async_redis_client_args(address)
+        self._owns_client = _owns_async_redis_client(address)
+        self.channel = channel
+        self.max_queue_size = max_queue_size
+        self.dropped: Counter[str] = collections.Counter()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._queue: "Optional[asyncio.Queue[str]]" = None
+        self._task: "Optional[asyncio.Task[None]]" = None
+
+    async def publish(self, record: logging.LogRecord) -> None:
+        """Format and publish a single record, waiting until Redis has received it."""
+        await self.client.publish(self.channel, self.format(record))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Format a record and queue it to be published by the event loop."""
+        if self._loop is None:
+            self.dropped["stopped"] += 1
+            return
+
+        try:
+            msg = self.format(record)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except BaseException:
+            self.handleError(record)
+            return
+
+        if threading.get_ident() == self._thread_id:
+            self._enqueue(msg)
+        else:
+            self._loop.call_soon_threadsafe(self._enqueue, msg)
+
+    def _enqueue(self, msg: str) -> None:
+        if self._queue is None:
+            self.dropped["stopped"] += 1
+            return
+        try:
+            self._queue.put_nowait(msg)
+        except asyncio.QueueFull:
+            self.dropped["newest"] += 1
+
+    async def _run(self) -> None:
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                async with self.client.pipeline(transaction=False) as pipeline:
+                    for msg in batch:
+                        pipeline.publish(self.channel, msg)
+                    await pipeline.execute()
+            except Exception:
+                self.dropped["error"] += len(batch)
+                logging.getLogger("error").exception("Error publishing log records to redis")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def start(self) -> None:
+        """Start the publishing task on the running event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._queue = asyncio.Queue(self.max_queue_size)
+        self._task = self._loop.create_task(self._run())
+
+    async def aclose(self) -> None:
+        """Publish any queued records, then stop the publishing task and close the client, if it was created here."""
+        if self._queue is not None and self._task is not None:
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._loop = self._thread_id = self._queue = self._task = None
+        if self._owns_client:
+            await self.client.close()
+        self.close()
+
+    async def __aenter__(self) -> "AsyncRedisPublisher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        await self.aclose()
+
+
+class AsyncRedisLogWatcher:
+    """
+    Watch Redis channels for logging, from an asyncio event loop.
+
+    Iterating over the watcher yields decoded log records as they arrive. Messages are only read from Redis
+    as the iterator is consumed, so a slow consumer applies backpressure::
+
+        async with AsyncRedisLogWatcher(url, "my-channel", makeLogRecordfromJson) as watcher:
+            async for record in watcher:
+                logging.getLogger(record.name).handle(record)
+
+    :meth:`run` does exactly this, for consumers which just want to handle every record.
+
+    Parameters
+    ----------
+    address: redis client arguments
+        The asyncio redis client, connection pool, URL, or ``(host, port)`` to read from. A client created from a
+        URL or ``(host, port)`` is closed by :meth:`aclose`, while a client or pool which is passed in is left open.
+    channel: str
+        The channel to subscribe to.
+    deserialize: callable
+        Function to turn messages into log records.
+
+    """
+
+    def __init__(self, address: AsyncClientArgs, channel: str, deserialize: Deserialize) -> None:
+        self.client = _handle_async_redis_client_args(address)
+        self._owns_client = _owns_async_redis_client(address)
+        self.pubsub = self.client.pubsub()
+        self.channels: List[str] = [channel]
+        self.deserialize = deserialize
+
+    async def subscribe(self, name: str) -> None:
+        """Subscribe to an additional channel."""
+        if name not in self.channels:
+            self.channels.append(name)
+        await self.pubsub.subscribe(name)
+
+    async def start(self) -> None:
+        """Subscribe to the watched channels."""
+        await self.pubsub.subscribe(*self.channels)
+
+    async def aclose(self) -> None:
+        """Unsubscribe, and close the client if it was created here."""
+        await self.pubsub.close()
+        if self._owns_client:
+            await self.client.close()
+
+    def process_message(self, msg: Any) -> List[logging.LogRecord]:
+        """Given a Redis message, create the logrecords it contains."""
+        records: List[logging.LogRecord] = []
+        try:
+            messages = unframe(msg["data"])
+        except Exception:
+            logging.getLogger("error").exception(
+                f"Error processing frame:\n{msg['data']!r}\n{traceback.format_exc()}", exc_info=True
+            )
+            return records
+
+        for data in messages:
+            try:
+                _, data = split_header(data)
+                records.append(self.deserialize(data))
+            except Exception:
+                logging.getLogger("error").exception(
+                    f"Error processing record:\n{data!r}\n{traceback.format_exc()}", exc_info=True
+                )
+        return records
+
+    async def __aiter__(self) -> AsyncIterator[logging.LogRecord]:
+        async for message in self.pubsub.listen():
+            if message["type"] not in ("message", "pmessage"):
+                continue
+            for record in self.process_message(message):
+                yield record
+
+    async def run(self) -> None:
+        """Handle every record from the watched channels, until cancelled."""
+        async for record in self:
+            logging.getLogger(record.name).handle(record)
+
+    async def __aenter__(self) -> "AsyncRedisLogWatcher":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        await self.aclose()
@@ -0,0 +1,319 @@
+"""
+Local storage for log messages which can't be published, while a sink is unavailable.
+
+A :class:`SpillFile` holds formatted messages, with the channel each was destined for, in a
+size-capped file on disk, in the order they were spilled, until they can be replayed. A
+:class:`CircuitBreaker` tracks whether the sink is available, so that an outage only costs one
+connection attempt per retry interval.
+"""
+
+import contextlib
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from typing import BinaryIO
+from typing import Callable
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import Union
+
+try:
+    import fcntl
+except ImportError:  # pragma: nocover
+    fcntl = None  # type: ignore
+
+__all__ = ["CircuitBreaker", "SpillFile"]
+
+Message = Union[str, bytes]
+
+#: A message, and the channel it should be sent to.
+Envelope = Tuple[str, Message]
+
+#: Marks the start of each entry, so that entries after a partial write can still be found.
+ENTRY_MAGIC = b"\x00FLS"
+
+_HEADER = struct.Struct(">4sHII")
+
+
+def _encode_entry(channel: str, message: Message) -> bytes:
+    name = channel.encode("utf-8")
+    data = message.encode("utf-8") if isinstance(message, str) else message
+    return _HEADER.pack(ENTRY_MAGIC, len(name), len(data), zlib.crc32(name + data)) + name + data
+
+
+def _find_magic(f: BinaryIO, position: int) -> int:
+    """The position of the next entry in a spill file at or after `position`, or -1 if there is none."""
+    f.seek(position)
+    tail = b""
+    while True:
+        chunk = f.read(64 * 1024)
+        if not chunk:
+            return -1
+        data = tail + chunk
+        index = data.find(ENTRY_MAGIC)
+        if index >= 0:
+            return position - len(tail) + index
+        tail = data[-(len(ENTRY_MAGIC) - 1) :]
+        position += len(chunk)
+
+
+def _read_entries(f: BinaryIO) -> Iterator[Tuple[int, str, bytes]]:
+    """Read ``(end, channel, message)`` entries from a spill file, where `end` is the position after each entry."""
+    size = os.fstat(f.fileno()).st_size
+    position = 0
+    while position + _HEADER.size <= size:
+        f.seek(position)
+        magic, name_length, length, checksum = _HEADER.unpack(f.read(_HEADER.size))
+        end = position + _HEADER.size + name_length + length
+        valid = magic == ENTRY_MAGIC and end <= size
+        body = f.read(name_length + length) if valid else b""
+        if not valid or zlib.crc32(body) != checksum:
+            # A partial write: skip to the start of the next entry.
+            position = _find_magic(f, position + 1)
+            if position < 0:
+                return
+            continue
+        yield end, body[:name_length].decode("utf-8"), body[name_length:]
+        position = end
+
+
+def _batches(
+    entries: Iterable[Tuple[int, str, bytes]], batch_size: int
+) -> Iterator[Tuple[int, List[Tuple[str, bytes]]]]:
+    batch: List[Tuple[str, bytes]] = []
+    end = 0
+    for end, channel, message in entries:
+        batch.append((channel, message))
+        if len(batch) >= batch_size:
+            yield end, batch
+            batch = []
+    if batch:
+        yield end, batch
+
+
+class CircuitBreaker:
+    """
+    Stop calling a service which is failing, and retry it after a cool-down period.
+
+    The breaker starts closed, and every call is allowed. After `failure_threshold` consecutive failures,
+    the breaker opens, and calls are refused until `reset_timeout` seconds have passed. Then a single trial
+    call is allowed (the breaker is half-open): if it succeeds the breaker closes, otherwise it stays open
+    for another `reset_timeout`.
+
+    Parameters
+    ----------
+    failure_threshold: int, optional
+        Number of consecutive failures which open the breaker. Defaults to 1.
+    reset_timeout: float, optional
+        Time, in seconds, before a trial call is allowed through an open breaker. Defaults to 5s.
+
+    """
+
+    def __init__(
+        self, failure_threshold: int = 1, reset_timeout: float = 5.0, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """The state of the breaker, one of ``"closed"``, ``"open"`` or ``"half-open"``."""
+        if self._opened_at is None:
+            return "closed"
+        if self.clock() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call should be attempted now."""
+        if self._opened_at is None:
+            return True
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = self.clock()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            # Only let one trial call through, until it reports its result.
+            self._opened_at = now
+            return True
+
+    def record_success(self) -> None:
+        """Record a successful call, which closes the breaker."""
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+
+    def record_failure(self) -> None:
+        """Record a failed call, which opens the breaker once there have been enough failures."""
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+
+
+class SpillFile:
+    """
+    A size-capped file of messages, waiting to be replayed in order.
+
+    Each message is appended to the file with the name of its channel, a length prefix and a checksum.
+    When the file would grow past `max_bytes`, new messages are dropped and counted in :attr:`dropped`,
+    so that an outage can't fill the disk. An entry which was only partly written, e.g. by a process
+    which crashed while spilling, is skipped when the file is read, and the entries after it are kept.
+
+    Several processes can share a spill file, e.g. the workers of a server configured from the same file:
+    appending and replaying hold an exclusive :func:`fcntl.flock` on a ``.lock`` file next to the spill
+    file, so one process can't replay and remove entries which another process is appending.
+
+    Parameters
+    ----------
+    path: str
+        Path to the spill file. Messages left in the file by a previous process are replayed too.
+    max_bytes: int, optional
+        Largest size of the spill file. Defaults to 64MiB.
+
+    Attributes
+    ----------
+    dropped: int
+        Number of messages which were dropped because the spill file was full.
+
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"], max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.path = os.fspath(path)
+        self.max_bytes = max_bytes
+        self.dropped = 0
+        self._lock = threading.RLock()
+        self._pending: Optional[bool] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.path!r}, max_bytes={self.max_bytes!r})"
+
+    def __len__(self) -> int:
+        with self._locked():
+            try:
+                with open(self.path, "rb") as f:
+                    return sum(1 for _ in _read_entries(f))
+            except FileNotFoundError:
+                return 0
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    @property
+    def size(self) -> int:
+        """Current size of the spill file, in bytes."""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    @property
+    def pending(self) -> bool:
+        """
+        Whether this process might have messages to replay.
+
+        The file is only checked the first time, for messages left by a previous process. After that,
+        this is tracked in memory, so it is cheap to check before every publish.
+        """
+        if self._pending is None:
+            self._pending = self.size > 0
+        return self._pending
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock:
+            if fcntl is None:  # pragma: nocover
+                yield
+                return
+            with open(f"{self.path}.lock", "a") as lockfile:
+                fcntl.flock(lockfile.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lockfile.fileno(), fcntl.LOCK_UN)
+
+    def append(self, messages: Sequence[Envelope]) -> None:
+        """Add ``(channel, message)`` pairs to the end of the spill file."""
+        with self._locked():
+            size = self.size
+            parts = []
+            for channel, message in messages:
+                entry = _encode_entry(channel, message)
+                if size + len(entry) > self.max_bytes:
+                    self.dropped += 1
+                    continue
+                parts.append(entry)
+                size += len(entry)
+
+            if parts:
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(parts))
+                self._pending = True
+
+    def replay(
+        self,
+        send: Callable[[List[Tuple[str, bytes]]], None],
+        batch_size: int = 100,
+        max_batches: Optional[int] = None,
+    ) -> int:
+        """
+        Send spilled ``(channel, message)`` pairs in order, in batches of `batch_size`, removing them from the
+        file once they are sent.
+
+        Messages are read from the file as they are sent, so a large spill file isn't loaded into memory. When
+        `max_batches` is given, at most that many batches are sent, and the rest are left for the next replay,
+        so that a caller isn't held up for the whole backlog; :attr:`pending` stays true until it is sent.
+
+        If `send` raises, messages which were not sent are kept for the next replay, and the error
+        is re-raised. Returns the number of messages which were sent. Other processes wait to append
+        to the file until the replay is finished.
+        """
+        with self._locked():
+            try:
+                f = open(self.path, "rb")
+            except FileNotFoundError:
+                self._pending = False
+                return 0
+
+            with f:
+                sent = 0
+                batches = 0
+                position = 0
+                remaining = True
+                try:
+                    for end, batch in _batches(_read_entries(f), batch_size):
+                        if max_batches is not None and batches >= max_batches:
+                            break
+                        send(batch)
+                        sent += len(batch)
+                        batches += 1
+                        position = end
+                    else:
+                        remaining = False
+                finally:
+                    if not remaining:
+                        os.unlink(self.path)
+                    elif position:
+                        self._truncate(f, position)
+                    self._pending = remaining
+            return sent
+
+    def _truncate(self, f: BinaryIO, position: int) -> None:
+        """Remove the entries before `position` from the spill file."""
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        f.seek(position)
+        with open(tmp, "wb") as out:
+            shutil.copyfileobj(f, out)
+        os.replace(tmp, self.path)
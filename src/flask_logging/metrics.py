@@ -0,0 +1,188 @@
+import bisect
+import threading
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+
+from flask import Blueprint
+from flask import Flask
+from flask import Response
+
+__all__ = ["LatencyHistograms", "get_metrics", "metrics_blueprint"]
+
+EXTENSION_NAME = "flask_logging.metrics"
+
+#: Default histogram bucket upper bounds, in seconds (the same as the Prometheus client defaults).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+#: Labels of the series which collects observations once there are too many series.
+OVERFLOW_LABELS = ("__overflow__", "", "")
+
+#: HTTP methods which are used as labels. Other methods, which come from the client, are labeled ``OTHER``.
+HTTP_METHODS = frozenset(["GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH"])
+
+SeriesKey = Tuple[str, str, str]
+
+
+class _Shard:
+    """Histograms recorded by a single thread, which only that thread modifies."""
+
+    def __init__(self, thread: threading.Thread) -> None:
+        self.thread = thread
+        self.series: Dict[SeriesKey, List[float]] = {}
+
+
+class LatencyHistograms:
+    """
+    Histograms of request latency, by endpoint, method and status code.
+
+    Each thread records into its own set of histograms, so recording a request doesn't take a lock,
+    except when a thread sees a series for the first time. The histograms are added together when they
+    are collected. Histograms from threads which have exited are merged into a single set.
+
+    The number of series is bounded by `max_series`: once it is reached, requests for new combinations
+    of labels are recorded in a single overflow series, and the new labels are not kept, so memory use is
+    bounded too. Series are labeled with the endpoint name, rather than the URL, and unusual HTTP methods
+    share a single label, so most applications have far fewer series than the limit.
+
+    Parameters
+    ----------
+    buckets: sequence of float, optional
+        Upper bounds of the histogram buckets, in seconds.
+    max_series: int, optional
+        Largest number of distinct series. Defaults to 1000.
+    name: str, optional
+        Name of the metric, in Prometheus format.
+
+    """
+
+    def __init__(
+        self,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        max_series: int = 1000,
+        name: str = "flask_request_duration_seconds",
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.max_series = max_series
+        self.name = name
+        self._keys: Set[SeriesKey] = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired: Dict[SeriesKey, List[float]] = {}
+
+    def _shard(self) -> _Shard:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._retire_shards()
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _retire_shards(self) -> None:
+        # Merge the histograms from threads which have exited, so that they don't accumulate.
+        live = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                live.append(shard)
+            else:
+                self._merge(self._retired, shard.series)
+        self._shards = live
+
+    def _admit(self, key: SeriesKey) -> SeriesKey:
+        if key in self._keys:
+            return key
+        if len(self._keys) >= self.max_series:
+            return OVERFLOW_LABELS
+        with self._lock:
+            if len(self._keys) < self.max_series:
+                self._keys.add(key)
+                return key
+        return OVERFLOW_LABELS
+
+    def observe(self, endpoint: Optional[str], method: str, status: int, duration: float) -> None:
+        """Record the duration of a request, in seconds."""
+        key = (endpoint or "", method if method in HTTP_METHODS else "OTHER", str(status))
+        series = self._shard().series
+        counts = series.get(key)
+        if counts is None:
+            key = self._admit(key)
+            counts = series.get(key)
+            if counts is None:
+                # Bucket counts, followed by the sum of the observations.
+                counts = [0.0] * (len(self.buckets) + 2)
+                series[key] = counts
+
+        counts[bisect.bisect_left(self.buckets, duration)] += 1
+        counts[-1] += duration
+
+    def collect(self) -> Dict[SeriesKey, List[float]]:
+        """Add up the histograms from every thread, returning non-cumulative bucket counts and the sum, by series."""
+        with self._lock:
+            self._retire_shards()
+            totals: Dict[SeriesKey, List[float]] = {key: list(counts) for key, counts in self._retired.items()}
+            for shard in self._shards:
+                self._merge(totals, shard.series)
+        return totals
+
+    def _merge(self, totals: Dict[SeriesKey, List[float]], series: Dict[SeriesKey, List[float]]) -> None:
+        for key, counts in list(series.items()):
+            total = totals.setdefault(key, [0.0] * len(counts))
+            for i, count in enumerate(counts):
+                total[i] += count
+
+    def prometheus(self) -> str:
+        """The histograms, in the Prometheus text exposition format."""
+        return "".join(self._prometheus_lines())
+
+    def _prometheus_lines(self) -> Iterator[str]:
+        name = self.name
+        yield f"# HELP {name} Duration of HTTP requests, in seconds.\n"
+        yield f"# TYPE {name} histogram\n"
+        bounds = [_format_float(bound) for bound in self.buckets] + ["+Inf"]
+        for (endpoint, method, status), counts in sorted(self.collect().items()):
+            labels = f'endpoint="{_escape(endpoint)}",method="{_escape(method)}",status="{_escape(status)}"'
+            cumulative = 0.0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f'{name}_bucket{{{labels},le="{bound}"}} {_format_float(cumulative)}\n'
+            yield f"{name}_sum{{{labels}}} {_format_float(counts[-1])}\n"
+            yield f"{name}_count{{{labels}}} {_format_float(cumulative)}\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_float(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def get_metrics(app: Flask) -> Optional[LatencyHistograms]:
+    """The latency histograms for an app, or `None` if metrics are not enabled"""
+    return app.extensions.get(EXTENSION_NAME)
+
+
+def metrics_blueprint(histograms: LatencyHistograms, name: str = "flask_logging_metrics") -> Blueprint:
+    """
+    A blueprint with a single view, which serves the latency histograms in Prometheus format.
+
+    Register it at the path you want to scrape::
+
+        app.register_blueprint(metrics_blueprint(histograms), url_prefix="/metrics")
+
+    """
+    blueprint = Blueprint(name, __name__)
+
+    @blueprint.route("/")
+    def metrics() -> Response:
+        return Response(histograms.prometheus(), mimetype="text/plain; version=0.0.4")
+
+    return blueprint
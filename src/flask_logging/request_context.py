@@ -1,14 +1,13 @@
-import dataclasses as dc
 from typing import Any
 from typing import Callable
-from typing import cast
 from typing import Dict
 from typing import Generator
+from typing import List
 from typing import Optional
 from typing import Tuple
 from typing import Union
-from weakref import WeakKeyDictionary
 
+from flask import _request_ctx_stack
 from flask import current_app
 from flask import Flask
 from flask import Response
@@ -23,9 +22,49 @@ _ContextWrappers = Dict["RequestContextWrapper", RequestContextGenerator]
 EXTENSION_NAME = "flask_logging.request_context"
 
 
-@dc.dataclass
 class _RequestContextState:
-    context_wrappers: _ContextWrappers = dc.field(default_factory=lambda: cast(_ContextWrappers, WeakKeyDictionary()))
+    """
+    The request context wrappers registered to an app, and the hooks which run them.
+
+    There is a single ``before_request`` and ``after_request`` hook for each app, which run every
+    wrapper in the order they were registered, and unwind them in reverse. The running generators
+    are kept on the request context, so concurrent requests don't share them.
+    """
+
+    #: Attribute of the request context where the running generators are kept.
+    context_attribute = "_flask_logging_context_wrappers"
+
+    def __init__(self) -> None:
+        self.wrappers: List["RequestContextWrapper"] = []
+
+    @property
+    def context_wrappers(self) -> _ContextWrappers:
+        """The generators running for the current request, by wrapper"""
+        ctx = _request_ctx_stack.top
+        if ctx is None:
+            return {}
+        return getattr(ctx, self.context_attribute, {})
+
+    def register(self, wrapper: "RequestContextWrapper") -> None:
+        if wrapper not in self.wrappers:
+            self.wrappers.append(wrapper)
+
+    def before_request(self) -> None:
+        running: _ContextWrappers = {}
+        setattr(_request_ctx_stack.top, self.context_attribute, running)
+        for wrapper in self.wrappers:
+            running[wrapper] = wrapper._start()
+
+    def after_request(self, response: Response) -> Response:
+        running: Optional[_ContextWrappers] = getattr(_request_ctx_stack.top, self.context_attribute, None)
+        if not running:
+            return response
+
+        for wrapper in reversed(list(running)):
+            # Remove each generator before it finishes, so it isn't resumed again if it raises.
+            ctx = running.pop(wrapper)
+            response = wrapper._finish(ctx, response)
+        return response
 
 
 class RequestContextWrapper:
@@ -60,9 +99,12 @@ class RequestContextWrapper:
             self.init_app(app)
 
     def init_app(self, app: Flask) -> None:
-        app.before_request(self._before_request)
-        app.after_request(self._after_request)
-        app.extensions[EXTENSION_NAME] = _RequestContextState()
+        state = app.extensions.get(EXTENSION_NAME)
+        if state is None:
+            state = app.extensions[EXTENSION_NAME] = _RequestContextState()
+            app.before_request(state.before_request)
+            app.after_request(state.after_request)
+        state.register(self)
 
     def _get_state(self) -> _RequestContextState:
         try:
@@ -79,26 +121,15 @@ class RequestContextWrapper:
 
         raise RuntimeError("No application found. Either work inside a view function or push an application context")
 
-    def _before_request(self) -> None:
-
+    def _start(self) -> RequestContextGenerator:
         ctx = self.context()
         try:
             next(ctx)
         except StopIteration as e:
             raise RuntimeError("Generator did not yield") from e
-        else:
-            state = self._get_state()
-            state.context_wrappers[self] = ctx
-
-    def _after_request(self, response: Response) -> Response:
-        state = self._get_state()
-
-        try:
-            ctx = state.context_wrappers.pop(self)
-        except KeyError:
-            # Can't find this context, so we don't modify the response and just return it here.
-            return response
+        return ctx
 
+    def _finish(self, ctx: RequestContextGenerator, response: Response) -> Response:
         try:
             ctx.send(response)
         except StopIteration as e:
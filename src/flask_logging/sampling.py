@@ -0,0 +1,134 @@
+import dataclasses as dc
+import random
+import time
+import zlib
+from typing import Any
+from typing import Dict
+from typing import Mapping
+from typing import Optional
+
+from flask import current_app
+from flask import Flask
+from flask import g
+from flask import request
+from flask import Response
+
+__all__ = ["RequestSampler", "get_sampler"]
+
+EXTENSION_NAME = "flask_logging.sampling"
+
+
+@dc.dataclass
+class RequestSampler:
+    """
+    Decide which requests and responses are logged.
+
+    Each request is sampled at the rate for its endpoint, its blueprint, or the global rate, in that
+    order. The decision is made once per request, and is derived from the request ID when there is one,
+    so that every service which sees a request makes the same decision. Responses are always logged
+    when they are errors, or when the request was slow, regardless of the sampling decision.
+
+    Parameters
+    ----------
+    rate: float
+        Fraction of requests which are logged, between 0 and 1.
+    endpoint_rates: dict
+        Sampling rates for individual endpoints, by endpoint name.
+    blueprint_rates: dict
+        Sampling rates for all of the endpoints in a blueprint, by blueprint name.
+    keep_errors: bool
+        Always log responses with a 5xx status, and requests which raised an exception.
+    keep_slower_than: float, optional
+        Always log responses to requests which took longer than this, in seconds.
+
+    """
+
+    rate: float = 1.0
+    endpoint_rates: Dict[str, float] = dc.field(default_factory=dict)
+    blueprint_rates: Dict[str, float] = dc.field(default_factory=dict)
+    keep_errors: bool = True
+    keep_slower_than: Optional[float] = None
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "RequestSampler":
+        """Create a sampler from the ``FLASK_LOGGING_SAMPLE_*`` configuration values"""
+        return cls(
+            rate=float(config.get("FLASK_LOGGING_SAMPLE_RATE", 1.0)),
+            endpoint_rates=dict(config.get("FLASK_LOGGING_SAMPLE_ENDPOINT_RATES") or {}),
+            blueprint_rates=dict(config.get("FLASK_LOGGING_SAMPLE_BLUEPRINT_RATES") or {}),
+            keep_errors=bool(config.get("FLASK_LOGGING_SAMPLE_KEEP_ERRORS", True)),
+            keep_slower_than=config.get("FLASK_LOGGING_SAMPLE_KEEP_SLOWER_THAN"),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any requests would not be logged"""
+        rates = [self.rate, *self.endpoint_rates.values(), *self.blueprint_rates.values()]
+        return any(rate < 1.0 for rate in rates)
+
+    def rate_for(self, endpoint: Optional[str], blueprint: Optional[str]) -> float:
+        """The sampling rate for requests to an endpoint"""
+        if endpoint is not None and endpoint in self.endpoint_rates:
+            return self.endpoint_rates[endpoint]
+        if blueprint is not None and blueprint in self.blueprint_rates:
+            return self.blueprint_rates[blueprint]
+        return self.rate
+
+    @staticmethod
+    def sample(request_id: Optional[str], rate: float) -> bool:
+        """Whether a request is sampled, at a given rate. Requests with the same ID get the same answer."""
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        if request_id is None:
+            return random.random() < rate
+        return zlib.crc32(request_id.encode("utf-8")) < rate * 2 ** 32
+
+    def start(self) -> None:
+        """Record the start of the current request, for the slow request rule"""
+        if self.keep_slower_than is not None:
+            g.setdefault("_flask_logging_sample_start", time.monotonic())
+
+    def sampled(self) -> bool:
+        """Whether the current request is sampled. The decision is cached for the rest of the request."""
+        decision = g.get("_flask_logging_sampled", None)
+        if decision is None:
+            request_id = g.get("request_id", None)
+            if request_id is None:
+                header = current_app.config.get("FLASK_LOGGING_REQUEST_ID_HEADER", "X-Request-ID")
+                request_id = request.headers.get(header, None)
+            decision = self.sample(request_id, self.rate_for(request.endpoint, request.blueprint))
+            g._flask_logging_sampled = decision
+        return decision
+
+    def keep(self, response: Response) -> bool:
+        """Whether a response should be logged, even if its request was not sampled"""
+        if self.keep_errors and (response.status_code >= 500 or g.get("_flask_logging_exception", False)):
+            return True
+        if self.keep_slower_than is not None:
+            duration = g.get("_request_duration", None)
+            if duration is None and "_flask_logging_sample_start" in g:
+                duration = time.monotonic() - g._flask_logging_sample_start
+            if duration is not None and duration > self.keep_slower_than:
+                return True
+        return False
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions[EXTENSION_NAME] = self
+        if self.keep_slower_than is not None:
+            app.before_request(self.start)
+
+
+def get_sampler(app: Flask) -> Optional[RequestSampler]:
+    """The request sampler for an app, or `None` if every request is logged"""
+    return app.extensions.get(EXTENSION_NAME)
+
+
+def record_exception(sender: Flask, **extra: Any) -> None:
+    """
+    Note that the current request raised an exception, so its response is logged.
+
+    Should be attached to the `got_request_exception` signal.
+    """
+    g._flask_logging_exception = True
@@ -0,0 +1,211 @@
+import dataclasses as dc
+import time
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Mapping
+from typing import Optional
+
+from flask import after_this_request
+from flask import current_app
+from flask import Flask
+from flask import g
+from flask import Response
+from flask.signals import request_tearing_down
+from werkzeug.wsgi import FileWrapper
+
+from .sampling import get_sampler
+
+__all__ = ["RequestPhaseTimer", "get_phase_timer", "request_phases"]
+
+EXTENSION_NAME = "flask_logging.timing"
+
+#: Phases of a request, and the marks which start and end them.
+PHASES = {
+    "before_request": ("start", "view"),
+    "view": ("view", "after_request"),
+    "after_request": ("after_request", "response"),
+    "teardown": ("teardown", "teardown_end"),
+    "first_byte": ("start", "first_byte"),
+}
+
+#: Phases which are known when the response is sent, and can be reported in the ``Server-Timing`` header.
+RESPONSE_PHASES = ("before_request", "view", "after_request")
+
+Marks = Dict[str, int]
+
+
+def request_phases(marks: Mapping[str, int]) -> Dict[str, int]:
+    """The duration of each phase of a request, in nanoseconds, from the times marked during the request."""
+    phases = {}
+    for phase, (start, end) in PHASES.items():
+        if start in marks and end in marks:
+            phases[phase] = marks[end] - marks[start]
+    return phases
+
+
+def server_timing(phases: Mapping[str, int]) -> str:
+    """Format phase durations as a ``Server-Timing`` header, in milliseconds."""
+    return ", ".join(f"{phase};dur={phases[phase] / 1e6:.3f}" for phase in RESPONSE_PHASES if phase in phases)
+
+
+@dc.dataclass
+class RequestPhaseTimer:
+    """
+    Time the phases of each request, with nanosecond resolution.
+
+    The phases are the ``before_request`` hooks, the view (including error handlers), the ``after_request``
+    hooks, and the ``teardown_request`` hooks, along with the time to the first byte of streamed responses.
+    The first three are known when the response is logged, and are added to the response record as
+    ``response["phases"]``. Teardown and the first byte of a streamed response happen after the response
+    has been logged, so when `log_phases` is set, all of the phases are logged again when the response is
+    closed, in a record with the event ``request_phases``.
+
+    The timer's hooks have to run first and last in each group of hooks, so the hooks which mark the end
+    of the ``before_request`` hooks and the start of teardown are added just before the first request,
+    after the app and its blueprints have registered their own hooks. The end of teardown is marked by
+    the ``request_tearing_down`` signal, which is sent after the app and blueprint teardown hooks.
+    Responses which are passed directly to the server, such as files sent with :func:`flask.send_file`,
+    are not wrapped to find the first byte, so the server can still send them efficiently. The server
+    doesn't close these responses, so their phases are logged at the end of teardown.
+
+    Parameters
+    ----------
+    server_timing: bool
+        Add the phases to the ``Server-Timing`` header of each response.
+    log_phases: bool
+        Log all of the phases when each response is closed.
+    logger_name: str
+        Name of the child of the app logger used to log the phases.
+
+    """
+
+    server_timing: bool = False
+    log_phases: bool = False
+    logger_name: str = "response"
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "RequestPhaseTimer":
+        """Create a timer from the ``FLASK_LOGGING_REQUEST_PHASES`` and ``FLASK_LOGGING_SERVER_TIMING`` values"""
+        return cls(
+            server_timing=bool(config.get("FLASK_LOGGING_SERVER_TIMING", False)),
+            log_phases=bool(config.get("FLASK_LOGGING_REQUEST_PHASES", False)),
+            logger_name=config.get("FLASK_LOGGING_RESPONSE_LOGGER_NAME", "response"),
+        )
+
+    def init_app(self, app: Flask) -> None:
+        app.extensions[EXTENSION_NAME] = self
+        # The app's hooks (the `None` key) run before the blueprint's before_request and teardown hooks,
+        # and after the blueprint's after_request hooks. After and teardown hooks run in the reverse order
+        # of registration.
+        app.before_request_funcs.setdefault(None, []).insert(0, self.start)
+        app.after_request_funcs.setdefault(None, []).insert(0, self.after_request)
+        request_tearing_down.connect(self.teardown, app)
+        if app.got_first_request:
+            self._install(app)
+        else:
+            app.before_first_request(lambda: self._install(app))
+
+    def _install(self, app: Flask) -> None:
+        for key, funcs in app.before_request_funcs.items():
+            if key is None or funcs:
+                funcs.append(self.view)
+        app.teardown_request_funcs.setdefault(None, []).append(self.teardown_start)
+
+    def _mark(self, name: str) -> None:
+        marks = g.get("_flask_logging_phase_marks", None)
+        if marks is not None:
+            marks[name] = time.perf_counter_ns()
+
+    def start(self) -> None:
+        """Mark the start of the request, before any other ``before_request`` hooks"""
+        g._flask_logging_phase_marks = {"start": time.perf_counter_ns()}
+
+    def view(self) -> None:
+        """Mark the end of the ``before_request`` hooks"""
+        marks = g.get("_flask_logging_phase_marks", None)
+        if marks is None:
+            return
+        if "view" not in marks:
+            # Request specific after hooks run before all of the others.
+            after_this_request(self.before_after_request)
+        marks["view"] = time.perf_counter_ns()
+
+    def before_after_request(self, response: Response) -> Response:
+        self._mark("after_request")
+        return response
+
+    def after_request(self, response: Response) -> Response:
+        """Mark the end of the ``after_request`` hooks, and report the phases which are complete"""
+        marks = g.get("_flask_logging_phase_marks", None)
+        if marks is None:
+            return response
+        marks["response"] = time.perf_counter_ns()
+
+        phases = request_phases(marks)
+        g._request_phases = phases
+        if self.server_timing and phases:
+            response.headers["Server-Timing"] = server_timing(phases)
+
+        # Responses which are passed directly to the server (e.g. files) are never closed by it.
+        passthrough = response.direct_passthrough or isinstance(response.response, FileWrapper)
+        if response.is_streamed and not passthrough:
+            response.response = _mark_first_byte(response.response, marks)
+
+        if self.log_phases and self._sampled(response):
+            logger = current_app.logger.getChild(self.logger_name)
+            request_id = g.get("request_id", None)
+
+            def log_phases() -> None:
+                logger.debug(
+                    "Request phases",
+                    extra=dict(phases=request_phases(marks), request_id=request_id, event="request_phases"),
+                )
+
+            if passthrough:
+                g._flask_logging_log_phases = log_phases
+            else:
+                response.call_on_close(log_phases)
+        return response
+
+    def _sampled(self, response: Response) -> bool:
+        sampler = get_sampler(current_app)
+        return sampler is None or sampler.sampled() or sampler.keep(response)
+
+    def teardown_start(self, exc: Optional[BaseException] = None) -> None:
+        marks = g.get("_flask_logging_phase_marks", None)
+        if marks is not None:
+            marks.setdefault("teardown", time.perf_counter_ns())
+
+    def teardown(self, sender: Flask, **extra: Any) -> None:
+        """
+        Mark the end of the ``teardown_request`` hooks.
+
+        Should be attached to the `request_tearing_down` signal.
+        """
+        marks = g.get("_flask_logging_phase_marks", None)
+        if marks is not None:
+            marks.setdefault("teardown", time.perf_counter_ns())
+            marks["teardown_end"] = time.perf_counter_ns()
+
+        log_phases = g.pop("_flask_logging_log_phases", None)
+        if log_phases is not None:
+            log_phases()
+
+
+def _mark_first_byte(iterable: Iterable[bytes], marks: Marks) -> Iterator[bytes]:
+    try:
+        for chunk in iterable:
+            if chunk:
+                marks.setdefault("first_byte", time.perf_counter_ns())
+            yield chunk
+    finally:
+        close = getattr(iterable, "close", None)
+        if close is not None:
+            close()
+
+
+def get_phase_timer(app: Flask) -> Optional[RequestPhaseTimer]:
+    """The request phase timer for an app, or `None` if phases are not timed"""
+    return app.extensions.get(EXTENSION_NAME)
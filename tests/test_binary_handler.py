@@ -0,0 +1,46 @@
+import datetime as dt
+import logging
+import sys
+import uuid
+
+import pytest
+from flask_logging.handlers.binary import BinaryFormatter
+from flask_logging.handlers.binary import makeLogRecordfromBinary
+from flask_logging.handlers.json import JSONFormatter
+
+pytest.importorskip("msgpack")
+
+
+def test_log_binaryfmt_roundtrip(record):
+    record.request = {"path": "/", "id": uuid.UUID(int=42)}
+    record.when = dt.datetime(2020, 9, 5, 19, 49, 32)
+
+    data = BinaryFormatter().format(record)
+    assert isinstance(data, bytes)
+    assert len(data) < len(JSONFormatter(backend="json").format(record))
+
+    rt_record = makeLogRecordfromBinary(data)
+
+    assert rt_record.request == {"path": "/", "id": str(uuid.UUID(int=42))}
+    assert rt_record.when == "2020-09-05T19:49:32"
+    for key, expected in record.__dict__.items():
+        if key not in {"request", "when"}:
+            assert rt_record.__dict__[key] == expected
+
+
+def test_log_binaryfmt_exc_info():
+    logger = logging.getLogger("test-binary-logging")
+    try:
+        raise ValueError("Some value error")
+    except ValueError:
+        record = logger.makeRecord(logger.name, logging.ERROR, __file__, 1, "Caught", (), sys.exc_info())
+
+    rt_record = makeLogRecordfromBinary(BinaryFormatter().format(record))
+
+    assert "ValueError: Some value error" in rt_record.exc_text
+    assert rt_record.exc_info is None
+
+
+def test_log_binaryfmt_version():
+    with pytest.raises(ValueError):
+        makeLogRecordfromBinary(b"\x00")
@@ -146,3 +146,40 @@ def test_wrong_app(app: Flask) -> None:
     with app.app_context():
         with pytest.raises(RuntimeError):
             request_dummy_context._get_state()
+
+
+def test_multiple_contexts(app: Flask) -> None:
+
+    sections = []
+
+    def make_context(name: str) -> RequestContextWrapper:
+        @request_context_manger
+        def request_named_context() -> RequestContextGenerator:
+            sections.append(f"before-{name}")
+            response = yield
+            sections.append(f"after-{name}")
+            return response
+
+        return request_named_context
+
+    first = make_context("first")
+    second = make_context("second")
+    before_request_funcs = len(app.before_request_funcs.get(None, []))
+
+    first.init_app(app)
+    with app.app_context():
+        state = first._get_state()
+    second.init_app(app)
+    second.init_app(app)
+
+    with app.app_context():
+        assert second._get_state() is state
+    assert state.wrappers == [first, second]
+    assert len(app.before_request_funcs[None]) == before_request_funcs + 1
+
+    with app.test_client() as client:
+        response = client.get("/")
+        assert not state.context_wrappers
+    assert response.status_code == 200
+
+    assert sections == ["before-first", "before-second", "after-second", "after-first"]
@@ -1,6 +1,17 @@
+import json
+import pickle
 import uuid
 
 import pytest
+from flask import Flask
+from flask import g
+from flask_logging import FlaskLogging
+from flask_logging import JSONFormatter
+from flask_logging import RequestInformation
+from flask_logging.flask import LazyRequestInformation
+from flask_logging.flask import app_information
+from flask_logging.flask import get_request_loggers
+from flask_logging.handlers.common import CommonLogFormat
 
 
 @pytest.mark.parametrize("request_id", [str(uuid.uuid4()), "foo", None])
@@ -35,8 +46,132 @@ def test_response_log_timing(client, watchlog):
     assert duration > 0.0
 
 
+def test_request_loggers(client, app, watchlog):
+    """Loggers are resolved once, and records are skipped when the loggers are disabled"""
+    loggers = get_request_loggers(app)
+    assert loggers is get_request_loggers(app)
+    assert loggers.request is app.logger.getChild("request")
+    assert loggers.response is app.logger.getChild("response")
+
+    loggers.request.setLevel("INFO")
+    loggers.response.setLevel("WARNING")
+    try:
+        client.get("/")
+    finally:
+        loggers.request.setLevel("NOTSET")
+        loggers.response.setLevel("NOTSET")
+
+    assert not watchlog.any("test-flask-logging.request")
+    assert not watchlog.any("test-flask-logging.response")
+
+
 def test_request_log_appinfo(client, watchlog):
     """Flask application info should be on the log record"""
     _ = client.get("/")
     record = watchlog.last("test-flask-logging.request")
     assert record.flask["environment"] == "test"
+
+
+def test_app_info_cached(client, app, watchlog):
+    """Flask application info should be gathered once for each app"""
+    client.get("/")
+    client.get("/")
+    first, second = watchlog.filter("test-flask-logging.request")[-2:]
+
+    assert first.flask is second.flask
+    assert first.flask is app_information(app)
+    assert first.flask == {"environment": "test", "instance_path": app.instance_path, "name": app.name}
+
+
+def test_app_info_startup(app, watchlog):
+    """Flask application info can be logged once, instead of on each record"""
+    startup_app = Flask("test-flask-logging-startup")
+    startup_app.env = "test"
+    startup_app.config.from_mapping(app.config)
+    startup_app.config["FLASK_LOGGING_APP_INFORMATION"] = "startup"
+    startup_app.add_url_rule("/", "home", lambda: "hello")
+    FlaskLogging(startup_app)
+
+    with startup_app.test_client() as client:
+        client.get("/")
+        client.get("/")
+
+    started = watchlog.filter("test-flask-logging-startup.app")
+    assert len(started) == 1
+    assert started[0].flask["environment"] == "test"
+    assert not hasattr(watchlog.last("test-flask-logging-startup.request"), "flask")
+
+
+def test_request_info_cached(app, watchlog):
+    """Request information should be gathered once per request, until the request ID changes"""
+    logger = app.logger.getChild("cached")
+    logger.addFilter(RequestInformation())
+
+    with app.test_request_context("/cached", headers={"User-Agent": "test-agent"}):
+        logger.info("first")
+        logger.info("second")
+        first, second = watchlog.filter(logger.name)
+
+        assert first.request == second.request
+        assert first.url == "/cached"
+        assert "id" not in first.request
+        assert first.request._resolve() is second.request._resolve()
+
+        g.request_id = "my-request"
+        logger.info("third")
+        third = watchlog.last(logger.name)
+        assert third.request["id"] == "my-request"
+        assert third.request._resolve() is not first.request._resolve()
+
+    with app.test_request_context("/other"):
+        logger.info("fourth")
+        assert watchlog.last(logger.name).request["path"] == "/other"
+
+
+def test_request_info_lazy(app, watchlog):
+    """Request information should only be gathered when it is read, even after the request"""
+    logger = app.logger.getChild("lazy")
+    logger.addFilter(RequestInformation())
+
+    with app.test_request_context("/lazy", headers={"User-Agent": "test-agent"}) as ctx:
+        g.request_id = "lazy-request"
+        logger.info("message")
+        record = watchlog.last(logger.name)
+        assert record.request._data is None
+        assert not hasattr(ctx.request, LazyRequestInformation.cache_attribute)
+
+    assert record.request["path"] == "/lazy"
+    assert str(record.request["user_agent"]) == "test-agent"
+
+    data = json.loads(JSONFormatter(backend="json").format(record))
+    assert data["request"]["id"] == "lazy-request"
+
+    restored = pickle.loads(pickle.dumps(record.request))
+    assert type(restored) is dict
+    assert restored["path"] == "/lazy"
+    assert str(restored["user_agent"]) == "test-agent"
+
+
+def test_request_info_writable(app, watchlog):
+    """Filters can add to the request information of a record, without changing other records"""
+    logger = app.logger.getChild("writable")
+    logger.addFilter(RequestInformation())
+
+    def add_user(record):
+        if record.getMessage() == "first":
+            record.request["username"] = "alice"
+            del record.request["user_agent"]
+        return True
+
+    logger.addFilter(add_user)
+
+    with app.test_request_context("/writable", environ_base={"REMOTE_ADDR": "10.0.0.1"}):
+        logger.info("first")
+        logger.info("second")
+        first, second = watchlog.filter(logger.name)
+
+    assert first.request["username"] == "alice"
+    assert "user_agent" not in first.request
+    assert "username" not in second.request
+    assert "user_agent" in second.request
+    assert CommonLogFormat().format(first).startswith("10.0.0.1 - alice [")
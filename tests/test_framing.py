@@ -0,0 +1,56 @@
+import pytest
+from flask_logging.handlers.framing import add_header
+from flask_logging.handlers.framing import CODECS
+from flask_logging.handlers.framing import decode_frame
+from flask_logging.handlers.framing import encode_frame
+from flask_logging.handlers.framing import HeaderFilter
+from flask_logging.handlers.framing import is_frame
+from flask_logging.handlers.framing import RecordHeader
+from flask_logging.handlers.framing import split_header
+from flask_logging.handlers.framing import unframe
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_frame_roundtrip(codec):
+    messages = ['{"message": "hello"}', b"\x01binary", ""]
+    frame = encode_frame(messages, codec)
+
+    assert is_frame(frame)
+    assert decode_frame(frame) == [b'{"message": "hello"}', b"\x01binary", b""]
+
+
+def test_frame_compresses():
+    messages = ['{"message": "a repeated log message"}'] * 100
+    assert len(encode_frame(messages, "zlib")) < len(encode_frame(messages, "none")) / 10
+
+
+@pytest.mark.parametrize("data", ['{"message": "hello"}', b'{"message": "hello"}', b"\x01binary"])
+def test_unframe_plain_message(data):
+    assert not is_frame(data)
+    assert unframe(data) == [data]
+
+
+def test_decode_unknown_codec():
+    frame = encode_frame(["hello"], "none")
+    with pytest.raises(ValueError):
+        decode_frame(frame[:4] + b"\xff" + frame[5:])
+
+
+def test_record_header():
+    data = add_header('{"message": "hello"}', 40, "app.db", 1599335372.5)
+    assert not is_frame(data)
+
+    header, message = split_header(data)
+    assert header == RecordHeader(40, 1599335372.5, "app.db")
+    assert message == b'{"message": "hello"}'
+
+    assert split_header(b'{"message": "hello"}') == (None, b'{"message": "hello"}')
+    assert unframe(encode_frame([data]))[0] == data
+
+
+@pytest.mark.parametrize(
+    "levelno, name, expected",
+    [(40, "app.db", True), (30, "app.db", False), (40, "app", True), (40, "application", False), (50, "other", False)],
+)
+def test_header_filter(levelno, name, expected):
+    assert HeaderFilter(40, "app").matches(levelno, name) is expected
@@ -1,10 +1,24 @@
+import datetime as dt
+import decimal
+import enum
+import io
 import json
 import logging
+import timeit
+import types
+import uuid
 import warnings
 
+import pytest
+from flask_logging.handlers.json import FlexJSONEncoder
+from flask_logging.handlers.json import get_backend
+from flask_logging.handlers.json import HasSchema
+from flask_logging.handlers.json import iterLogRecordsfromJson
 from flask_logging.handlers.json import JSONFormatter
 from flask_logging.handlers.json import JSONLogWarning
+from flask_logging.handlers.json import StdlibJSONBackend
 from flask_logging.handlers.json import makeLogRecordfromJson
+from flask_logging.handlers.json import TRUNCATION_MARKER
 
 
 def test_request_log_jsonfmt(client, watchlog):
@@ -81,3 +95,246 @@ def test_log_jsonfmt_schema(record, recwarn):
     data = json.loads(formatter.format(record))
     assert data["my_attr"] == "MockObjWithSchema"
     assert len(recwarn) == 0
+
+
+def test_log_jsonfmt_compiled(record):
+    record.request = {"path": "/", "method": "GET"}
+
+    data = json.loads(JSONFormatter(compiled=True).format(record))
+    expected = json.loads(JSONFormatter().format(record))
+
+    assert data == expected
+    assert list(data) == ["logger", "message_info", "python", "timing", "request"]
+
+
+def test_log_jsonfmt_compiled_roundtrip(record):
+    formatter = JSONFormatter(compiled=True)
+
+    rt_record = makeLogRecordfromJson(formatter.format(record))
+
+    for key, expected in record.__dict__.items():
+        assert rt_record.__dict__[key] == expected
+
+
+def test_log_jsonfmt_message_dict():
+    data = json.dumps({"message": {"text": "hello %s", "args": ["world"]}, "logger": {"name": "app"}})
+    rt_record = makeLogRecordfromJson(data)
+
+    assert rt_record.name == "app"
+    assert rt_record.getMessage() == "hello world"
+
+
+@pytest.mark.parametrize("mode", ["str", "bytes"])
+def test_log_jsonfmt_ndjson(record, mode):
+    formatter = JSONFormatter()
+    records = []
+    for i in range(3):
+        r = logging.makeLogRecord({**record.__dict__, "args": (i,), "msg": "record %d"})
+        records.append(formatter.format(r))
+
+    text = "\n".join(records[:2]) + "\n\n" + records[2] + "\n"
+    source = io.StringIO(text) if mode == "str" else io.BytesIO(text.encode("utf-8"))
+
+    rt_records = iterLogRecordsfromJson(source)
+    assert next(rt_records).getMessage() == "record 0"
+    assert [r.getMessage() for r in rt_records] == ["record 1", "record 2"]
+
+
+def test_log_jsonfmt_ndjson_invalid(record):
+    lines = [JSONFormatter().format(record), "{not json"]
+    rt_records = iterLogRecordsfromJson(lines)
+    next(rt_records)
+
+    with pytest.raises(ValueError, match="line 2"):
+        next(rt_records)
+
+
+def test_flexencoder_register(record, recwarn):
+    warnings.simplefilter("always")
+
+    class Encoder(FlexJSONEncoder):
+        pass
+
+    class Temperature:
+        def __init__(self, value):
+            self.value = value
+
+    class Measured(Temperature):
+        pass
+
+    assert Encoder.resolve(Measured) is None
+
+    @Encoder.register(Temperature)
+    def convert_temperature(value):
+        return {"degrees": value.value}
+
+    assert Encoder.resolve(Measured) is convert_temperature
+    assert FlexJSONEncoder.resolve(Measured) is None
+    assert json.loads(json.dumps({"t": Measured(4)}, cls=Encoder)) == {"t": {"degrees": 4}}
+    assert len(recwarn) == 0
+
+
+def test_flexencoder_converters_changed():
+    class Encoder(FlexJSONEncoder):
+        converters = dict(FlexJSONEncoder.converters)
+
+    assert Encoder.resolve(decimal.Decimal) is None
+    Encoder.converters[decimal.Decimal] = str
+    assert Encoder.resolve(decimal.Decimal) is str
+
+    assert FlexJSONEncoder.resolve(decimal.Decimal) is None
+    FlexJSONEncoder.converters[decimal.Decimal] = float
+    try:
+        assert FlexJSONEncoder.resolve(decimal.Decimal) is float
+    finally:
+        del FlexJSONEncoder.converters[decimal.Decimal]
+    assert FlexJSONEncoder.resolve(decimal.Decimal) is None
+
+
+def test_flexencoder_mro():
+    assert FlexJSONEncoder.resolve(dt.datetime) is FlexJSONEncoder.converters[dt.datetime]
+    assert FlexJSONEncoder.resolve(dt.date) is FlexJSONEncoder.converters[dt.date]
+    assert FlexJSONEncoder.resolve(MockObjWithSchema) is FlexJSONEncoder.converters[HasSchema]
+
+
+@pytest.fixture(params=["json", "orjson"])
+def backend(request):
+    if request.param != "json":
+        pytest.importorskip(request.param)
+    return request.param
+
+
+def test_log_jsonfmt_backend(record, backend, recwarn):
+    warnings.simplefilter("always")
+
+    record.when = dt.datetime(2020, 9, 5, 19, 49, 32, 295)
+    record.day = dt.date(2020, 9, 5)
+    record.uid = uuid.UUID(int=42)
+    record.counts = {1: "one", 2: "two"}
+    record.huge = 2 ** 70
+
+    data = JSONFormatter(backend=backend).format(record)
+    expected = JSONFormatter(backend="json").format(record)
+
+    assert json.loads(data) == json.loads(expected)
+    assert len(recwarn) == 0
+
+    rt_record = makeLogRecordfromJson(data, backend=backend)
+    assert rt_record.msg == record.msg
+    assert rt_record.when == "2020-09-05T19:49:32.000295"
+
+
+class Color(enum.Enum):
+    RED = 1
+
+
+class Name(str):
+    pass
+
+
+def test_log_jsonfmt_backend_identical(record, backend):
+    record.name = Name("test.log")
+    record.count = True
+    record.paint = types.MappingProxyType({"colors": ("red", "blue")})
+
+    data = json.loads(JSONFormatter(backend=backend).format(record))
+    assert data == json.loads(JSONFormatter(backend="json").format(record))
+    assert data["paint"] == {"colors": ["red", "blue"]}
+
+
+def test_log_jsonfmt_orjson_differences(record):
+    pytest.importorskip("orjson")
+    record.color = Color.RED
+    record.limit = float("inf")
+
+    data = json.loads(JSONFormatter(backend="json").format(record))
+    assert data["color"] == "RED"
+    assert data["limit"] == float("inf")
+
+    data = json.loads(JSONFormatter(backend="orjson").format(record))
+    assert data["color"] == 1
+    assert data["limit"] is None
+
+
+def test_log_jsonfmt_orjson_speed(record):
+    pytest.importorskip("orjson")
+    record.request = {"path": "/", "headers": {"Accept": "*/*"}, "args": ["a", "b"]}
+    record.when = dt.datetime(2020, 9, 5, 19, 49, 32)
+
+    formatters = {backend: JSONFormatter(backend=backend) for backend in ("json", "orjson")}
+    timings = {backend: [] for backend in formatters}
+    # Alternate between the backends, so that both see the same noise from the rest of the machine.
+    for _ in range(20):
+        for backend, formatter in formatters.items():
+            timings[backend].append(timeit.timeit(lambda: formatter.format(record), number=100))
+
+    assert min(timings["orjson"]) <= min(timings["json"])
+
+
+def test_log_jsonfmt_default_backend():
+    assert isinstance(get_backend(), StdlibJSONBackend)
+    assert isinstance(JSONFormatter().backend, StdlibJSONBackend)
+
+
+def test_log_jsonfmt_unknown_backend():
+    with pytest.raises(ValueError):
+        get_backend("not-a-json-backend")
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_log_jsonfmt_projection(record, compiled):
+    record.request = {"path": "/"}
+    record.response = {"status_code": 200}
+
+    formatter = JSONFormatter(compiled=compiled, exclude=["relativeCreated", "msecs", "processName", "response"])
+    data = json.loads(formatter.format(record))
+
+    assert "relativeCreated" not in data["timing"]
+    assert "msecs" not in data["timing"]
+    assert "name" not in data["python"]["process"]
+    assert "response" not in data
+    assert data["request"] == {"path": "/"}
+
+    formatter = JSONFormatter(compiled=compiled, include=["name", "levelno", "msg", "response"])
+    data = json.loads(formatter.format(record))
+    assert data == {
+        "logger": {"name": "test.log", "level": {"number": record.levelno}},
+        "message_info": {"text": "Some message here!"},
+        "response": {"status_code": 200},
+    }
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_log_jsonfmt_max_field_size(record, compiled):
+    record.msg = "Some message about %s"
+    record.args = ("x" * 100,)
+    record.big = {"key": "y" * 100}
+    record.small = {"key": "z"}
+
+    formatter = JSONFormatter(compiled=compiled, backend="json", max_field_size=32)
+    data = json.loads(formatter.format(record))
+
+    assert data["big"] == '{"key": "' + "y" * 23 + TRUNCATION_MARKER
+    assert data["small"] == {"key": "z"}
+    assert data["message_info"]["args"].endswith(TRUNCATION_MARKER)
+    assert data["message"] == "Some message about " + "x" * 13 + TRUNCATION_MARKER
+
+    rt_record = makeLogRecordfromJson(json.dumps(data))
+    assert rt_record.getMessage() == data["message"]
+
+
+@pytest.mark.parametrize("compiled", [False, True])
+def test_log_jsonfmt_max_field_size_msg(record, compiled):
+    record.msg = "Some long message about " + "x" * 20 + " and %s"
+    record.args = ("y",)
+
+    formatter = JSONFormatter(compiled=compiled, backend="json", max_field_size=32)
+    data = json.loads(formatter.format(record))
+
+    assert data["message_info"]["text"].endswith(TRUNCATION_MARKER)
+    assert data["message_info"]["args"].endswith(TRUNCATION_MARKER)
+    assert data["message"] == "Some long message about " + "x" * 8 + TRUNCATION_MARKER
+
+    rt_record = makeLogRecordfromJson(json.dumps(data))
+    assert rt_record.args is None
+    assert rt_record.getMessage() == data["message"]
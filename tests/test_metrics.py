@@ -0,0 +1,97 @@
+import threading
+
+from flask import Flask
+from flask_logging import FlaskLogging
+from flask_logging.metrics import get_metrics
+from flask_logging.metrics import LatencyHistograms
+from flask_logging.metrics import OVERFLOW_LABELS
+
+
+def test_histograms_threads():
+    histograms = LatencyHistograms(buckets=(0.1, 1.0))
+
+    def work():
+        for duration in (0.05, 0.5, 5.0):
+            histograms.observe("home", "GET", 200, duration)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    histograms.observe("home", "GET", 200, 0.1)
+    assert histograms.collect() == {("home", "GET", "200"): [5, 4, 4, 4 * 5.55 + 0.1]}
+
+    # Histograms from threads which have exited are merged, and are still counted.
+    assert len(histograms._shards) == 1
+    assert histograms.collect()[("home", "GET", "200")][0] == 5
+
+
+def test_histograms_bounded():
+    histograms = LatencyHistograms(buckets=(1.0,), max_series=2)
+    for i in range(10):
+        histograms.observe(f"endpoint-{i}", "GET", 200, 0.5)
+        histograms.observe(f"endpoint-{i}", "GET", 200, 0.5)
+
+    totals = histograms.collect()
+    assert len(totals) == 3
+    assert totals[OVERFLOW_LABELS] == [16, 0, 8.0]
+    assert totals[("endpoint-0", "GET", "200")] == [2, 0, 1.0]
+
+    # Labels which overflow are not kept.
+    assert len(histograms._keys) == 2
+    assert len(histograms._shard().series) == 3
+
+
+def test_histograms_methods():
+    histograms = LatencyHistograms(buckets=(1.0,), max_series=10)
+    for i in range(100):
+        histograms.observe("home", f"MADEUP{i}", 405, 0.5)
+
+    assert histograms.collect() == {("home", "OTHER", "405"): [100, 0, 50.0]}
+
+
+def test_histograms_prometheus():
+    histograms = LatencyHistograms(buckets=(0.1, 1.0))
+    histograms.observe("home", "GET", 200, 0.05)
+    histograms.observe("home", "GET", 200, 0.5)
+    histograms.observe('say "hi"', "POST", 500, 2.0)
+
+    lines = histograms.prometheus().splitlines()
+    assert lines[:2] == [
+        "# HELP flask_request_duration_seconds Duration of HTTP requests, in seconds.",
+        "# TYPE flask_request_duration_seconds histogram",
+    ]
+    labels = 'endpoint="home",method="GET",status="200"'
+    assert lines[2:7] == [
+        f'flask_request_duration_seconds_bucket{{{labels},le="0.1"}} 1',
+        f'flask_request_duration_seconds_bucket{{{labels},le="1"}} 2',
+        f'flask_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2',
+        f"flask_request_duration_seconds_sum{{{labels}}} 0.55",
+        f"flask_request_duration_seconds_count{{{labels}}} 2",
+    ]
+    assert 'endpoint="say \\"hi\\""' in lines[7]
+
+
+def test_metrics_endpoint(app: Flask):
+    app.config["FLASK_LOGGING_REQUEST_DURATION"] = False
+    app.config["FLASK_LOGGING_METRICS"] = True
+    app.config["FLASK_LOGGING_METRICS_ENDPOINT"] = "/metrics"
+    FlaskLogging(app)
+
+    with app.test_client() as client:
+        client.get("/")
+        client.get("/")
+        client.get("/missing")
+        response = client.get("/metrics/")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'flask_request_duration_seconds_count{endpoint="home",method="GET",status="200"} 2' in body
+    assert 'flask_request_duration_seconds_count{endpoint="",method="GET",status="404"} 1' in body
+
+    metrics = get_metrics(app)
+    assert metrics is not None
+    assert len(metrics.collect()) == 3
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import random
+import string
+
+import pytest
+from flask_logging.handlers.json import JSONFormatter
+from flask_logging.handlers.json import makeLogRecordfromJson
+
+redis_asyncio = pytest.importorskip("redis.asyncio")
+pytestmark = pytest.mark.redis()
+
+from flask_logging.handlers.redis_asyncio import AsyncRedisLogWatcher  # noqa: E402
+from flask_logging.handlers.redis_asyncio import AsyncRedisPublisher  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def url():
+    url = os.environ.get("REDIS_URL", "redis://localhost:6379/1")
+    yield url
+
+
+@pytest.fixture
+def channel():
+
+    extra = "".join(random.choices(string.ascii_letters, k=5))
+
+    yield f"test-redis-channel-{extra}"
+
+
+def test_async_publish_and_watch(url, record, channel):
+    async def main():
+        received = []
+
+        async with AsyncRedisLogWatcher(url, channel, makeLogRecordfromJson) as watcher:
+            async with AsyncRedisPublisher(url, channel) as handler:
+                handler.setFormatter(JSONFormatter())
+
+                await handler.publish(record)
+                handler.emit(record)
+                handler.emit(record)
+
+            async for actual in watcher:
+                received.append(actual)
+                if len(received) == 3:
+                    break
+
+        return received, handler.dropped
+
+    received, dropped = asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+    assert [actual.msg for actual in received] == [record.msg] * 3
+    assert [actual.levelno for actual in received] == [record.levelno] * 3
+    assert not dropped
+
+
+def test_async_publish_overflow(url, record, channel):
+    async def main():
+        async with AsyncRedisPublisher(url, channel, max_queue_size=1) as handler:
+            handler.setFormatter(JSONFormatter())
+            handler.emit(record)
+            handler.emit(record)
+        handler.emit(record)
+        return handler.dropped
+
+    dropped = asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+    assert dropped == {"newest": 1, "stopped": 1}
+
+
+def test_async_watcher_run(url, record, channel, watchlog):
+    async def main():
+        async with AsyncRedisLogWatcher(url, channel, makeLogRecordfromJson) as watcher:
+            task = asyncio.ensure_future(watcher.run())
+
+            async with AsyncRedisPublisher(url, channel) as handler:
+                handler.setFormatter(JSONFormatter())
+                await handler.publish(record)
+
+            while not watchlog.any(record.name):
+                await asyncio.sleep(0.01)
+            task.cancel()
+
+    asyncio.run(asyncio.wait_for(main(), timeout=5))
+
+    assert watchlog.last(record.name).msg == record.msg
+
+
+def test_async_shared_client(url, record, channel):
+    async def main():
+        client = redis_asyncio.Redis.from_url(url)
+        closed = []
+        close = client.close
+
+        async def track_close():
+            closed.append(client)
+            await close()
+
+        client.close = track_close
+
+        async with AsyncRedisLogWatcher(client, channel, makeLogRecordfromJson) as watcher:
+            async with AsyncRedisPublisher(client, channel) as handler:
+                handler.setFormatter(JSONFormatter())
+                await handler.publish(record)
+
+            async for actual in watcher:
+                break
+
+        # The client was passed in, so it is left open for its owner.
+        assert not closed
+        await client.close()
+        return actual
+
+    actual = asyncio.run(asyncio.wait_for(main(), timeout=5))
+    assert actual.msg == record.msg
@@ -3,12 +3,21 @@ import logging
 import os
 import random
 import string
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
+from flask_logging.handlers.binary import BinaryFormatter
 from flask_logging.handlers.json import JSONFormatter
 from flask_logging.handlers.json import makeLogRecordfromJson
+from flask_logging.handlers.redis import BufferedRedisPublisher
+from flask_logging.handlers.redis import DESERIALIERS
+from flask_logging.handlers.redis import level_channels
 from flask_logging.handlers.redis import RedisLogWatcher
 from flask_logging.handlers.redis import RedisPublisher
+from flask_logging.handlers.redis import RedisStreamPublisher
+from flask_logging.handlers.redis import RedisStreamWatcher
 
 redis = pytest.importorskip("redis")
 pytestmark = pytest.mark.redis()
@@ -57,6 +66,53 @@ def test_publish_to_redis(url, channel):
     assert "A test message we send" in data["message_info"]["text"]
 
 
+def test_shared_client(url, channel):
+
+    publisher = RedisPublisher(url, channel)
+    buffered = BufferedRedisPublisher(url, channel)
+    watcher = RedisLogWatcher(url, channel, makeLogRecordfromJson)
+
+    assert buffered.client is publisher.client
+    assert watcher.pubsub.connection_pool is publisher.client.connection_pool
+    watcher.pubsub.close()
+
+    client = redis.Redis.from_url(url)
+    assert RedisPublisher(client, channel).client is client
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="Requires os.fork")
+def test_shared_client_after_fork(url, channel):
+
+    publisher = RedisPublisher(url, channel)
+    publisher.client.ping()
+    parent_connections = list(publisher.client.connection_pool._available_connections)
+    assert parent_connections
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pragma: nocover
+        status = 1
+        try:
+            pool = RedisPublisher(url, channel).client.connection_pool
+            if pool is publisher.client.connection_pool and pool.pid == os.getpid():
+                if not any(c in parent_connections for c in pool._available_connections):
+                    publisher.client.ping()
+                    status = 0
+        finally:
+            os.write(write, bytes([status]))
+            os._exit(0)
+
+    os.close(write)
+    try:
+        assert os.read(read, 1) == b"\x00"
+    finally:
+        os.close(read)
+        os.waitpid(pid, 0)
+
+    assert publisher.client.ping()
+    assert publisher.client.connection_pool._available_connections == parent_connections
+
+
 def test_listen_from_redis(watchlog, url, record, channel):
 
     watcher = RedisLogWatcher(url, channel, makeLogRecordfromJson)
@@ -79,3 +135,339 @@ def test_listen_from_redis(watchlog, url, record, channel):
 
     assert actual.levelno == record.levelno
     assert actual.msg == record.msg
+
+
+def receive(pubsub, count, timeout=1.0):
+    messages = []
+    deadline = time.monotonic() + timeout
+    while len(messages) < count and time.monotonic() < deadline:
+        message = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.05)
+        if message is not None:
+            messages.append(message)
+    return messages
+
+
+def test_buffered_publish_to_redis(url, channel, record):
+
+    client = redis.Redis.from_url(url)
+    pubsub = client.pubsub()
+    pubsub.subscribe(channel)
+
+    handler = BufferedRedisPublisher(url, channel, batch_size=5, flush_interval=60)
+    handler.setFormatter(JSONFormatter())
+
+    for _ in range(4):
+        handler.emit(record)
+    assert receive(pubsub, 1, timeout=0.2) == []
+
+    handler.emit(record)
+    assert len(receive(pubsub, 5)) == 5
+
+    handler.emit(record)
+    handler.close()
+    messages = receive(pubsub, 1)
+    assert len(messages) == 1
+    assert json.loads(messages[0]["data"])["message_info"]["text"] == record.msg
+
+
+def test_buffered_publish_compressed(watchlog, url, channel, record):
+
+    client = redis.Redis.from_url(url)
+    pubsub = client.pubsub()
+    pubsub.subscribe(channel)
+
+    handler = BufferedRedisPublisher(url, channel, batch_size=5, flush_interval=60, compression="zlib")
+    handler.setFormatter(JSONFormatter())
+
+    for _ in range(5):
+        handler.emit(record)
+    handler.close()
+
+    messages = receive(pubsub, 2, timeout=0.2)
+    assert len(messages) == 1
+
+    watcher = RedisLogWatcher(url, channel, makeLogRecordfromJson)
+    watcher.process_message(messages[0])
+    assert len(watchlog.filter(record.name)) == 5
+    assert watchlog.last(record.name).msg == record.msg
+
+
+def test_publisher_unknown_compression(url, channel):
+    with pytest.raises(ValueError):
+        RedisPublisher(url, channel, compression="lz5")
+
+
+def test_buffered_publish_interval(url, channel, record):
+
+    client = redis.Redis.from_url(url)
+    pubsub = client.pubsub()
+    pubsub.subscribe(channel)
+
+    handler = BufferedRedisPublisher(url, channel, batch_size=100, flush_interval=0.01)
+    handler.setFormatter(JSONFormatter())
+
+    handler.emit(record)
+    handler.emit(record)
+    assert len(receive(pubsub, 2)) == 2
+    handler.close()
+
+
+@pytest.mark.parametrize(
+    "overflow, levels, dropped, kept",
+    [
+        ("drop_newest", ["INFO", "INFO", "ERROR"], {"newest": 1}, [0, 1]),
+        ("drop_oldest", ["INFO", "INFO", "ERROR"], {"oldest": 1}, [1, 2]),
+        ("drop_below_level", ["INFO", "ERROR", "INFO"], {"level": 1}, [0, 1]),
+        ("drop_below_level", ["INFO", "INFO", "ERROR"], {"oldest": 1}, [1, 2]),
+    ],
+)
+def test_buffered_publish_overflow(url, channel, overflow, levels, dropped, kept):
+
+    client = redis.Redis.from_url(url)
+    pubsub = client.pubsub()
+    pubsub.subscribe(channel)
+
+    handler = BufferedRedisPublisher(url, channel, flush_interval=60, max_queue_size=2, overflow=overflow)
+    handler.setFormatter(JSONFormatter())
+
+    logger = logging.getLogger("test-redis-overflow")
+    for i, level in enumerate(levels):
+        handler.emit(logger.makeRecord(logger.name, getattr(logging, level), __file__, 1, str(i), (), None))
+
+    assert handler.dropped == dropped
+    handler.close()
+
+    received = [json.loads(message["data"]) for message in receive(pubsub, 2)]
+    assert [data["message_info"]["text"] for data in received] == [str(i) for i in kept]
+
+
+@pytest.fixture
+def stream(url, channel):
+    yield channel
+    redis.Redis.from_url(url).delete(channel)
+
+
+def test_stream_publish_and_watch(watchlog, url, record, stream):
+
+    first = RedisStreamWatcher(url, stream, makeLogRecordfromJson, group="test-group", consumer="first")
+    second = RedisStreamWatcher(url, stream, makeLogRecordfromJson, group="test-group", consumer="second")
+
+    handler = RedisStreamPublisher(url, stream, maxlen=100)
+    handler.setFormatter(JSONFormatter())
+
+    for _ in range(4):
+        handler.emit(record)
+
+    first.count = 3
+    assert first.poll() == 0  # Nothing pending yet
+    assert first.poll() == 3
+    assert second.poll() == 0
+    assert second.poll() == 1
+
+    records = watchlog.filter(record.name)
+    assert len(records) == 4
+    assert all(actual.msg == record.msg for actual in records)
+
+    client = redis.Redis.from_url(url)
+    assert client.xpending(stream, "test-group")["pending"] == 0
+
+
+def test_stream_watcher_recovers_pending(watchlog, url, record, stream):
+
+    handler = RedisStreamPublisher(url, stream)
+    handler.setFormatter(JSONFormatter())
+
+    client = redis.Redis.from_url(url)
+    client.xgroup_create(stream, "test-group", mkstream=True)
+    handler.emit(record)
+    handler.emit(record)
+
+    # Simulate a watcher which read records and then crashed before acknowledging them.
+    client.xreadgroup("test-group", "restarted", {stream: ">"}, count=2)
+    assert client.xpending(stream, "test-group")["pending"] == 2
+
+    watcher = RedisStreamWatcher(
+        url, stream, makeLogRecordfromJson, group="test-group", consumer="restarted", block=0.05
+    )
+    with watcher:
+        deadline = time.monotonic() + 1.0
+        while len(watchlog.filter(record.name)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    assert len(watchlog.filter(record.name)) == 2
+    assert client.xpending(stream, "test-group")["pending"] == 0
+
+
+@pytest.mark.parametrize("autoclaim", [True, False])
+def test_stream_watcher_claims_abandoned(watchlog, url, record, stream, monkeypatch, autoclaim):
+
+    handler = RedisStreamPublisher(url, stream)
+    handler.setFormatter(JSONFormatter())
+
+    client = redis.Redis.from_url(url)
+    client.xgroup_create(stream, "test-group", mkstream=True)
+    for _ in range(3):
+        handler.emit(record)
+
+    # Simulate a watcher which read records and then exited for good before acknowledging them.
+    client.xreadgroup("test-group", "gone-away", {stream: ">"}, count=3)
+
+    watcher = RedisStreamWatcher(
+        url, stream, makeLogRecordfromJson, group="test-group", consumer="survivor", count=2, claim_idle=0.05
+    )
+    if not autoclaim:
+
+        def xautoclaim(*args, **kwargs):
+            raise redis.ResponseError("unknown command `XAUTOCLAIM`")
+
+        monkeypatch.setattr(watcher.client, "xautoclaim", xautoclaim)
+
+    assert watcher.poll() == 0, "The records have not been idle for long enough"
+    time.sleep(0.1)
+    assert watcher.poll() == 3
+
+    assert len(watchlog.filter(record.name)) == 3
+    assert client.xpending(stream, "test-group")["pending"] == 0
+
+
+def test_watcher_thread(watchlog, url, record, channel):
+
+    watcher = RedisLogWatcher(url, channel, makeLogRecordfromJson)
+
+    handler = RedisPublisher(url, channel)
+    handler.setFormatter(JSONFormatter())
+
+    with watcher:
+        for _ in range(3):
+            handler.emit(record)
+
+        deadline = time.monotonic() + 1.0
+        while len(watchlog.filter(record.name)) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        start = time.monotonic()
+
+    assert time.monotonic() - start < 0.5
+    assert not watcher.pubsub.subscribed
+    assert len(watchlog.filter(record.name)) == 3
+
+
+@pytest.mark.parametrize("executor_cls", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_watcher_parallel_decode(watchlog, url, channel, executor_cls):
+
+    logger = logging.getLogger("test-redis-parallel")
+    handler = RedisPublisher(url, channel)
+    handler.setFormatter(JSONFormatter())
+
+    with executor_cls(max_workers=2) as executor:
+        watcher = RedisLogWatcher(url, channel, makeLogRecordfromJson, executor=executor, decode_batch_size=4)
+        with watcher:
+            for i in range(25):
+                handler.emit(logger.makeRecord(logger.name, logging.INFO, __file__, 1, "%d", (i,), None))
+
+            deadline = time.monotonic() + 5.0
+            while len(watchlog.filter(logger.name)) < 25 and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+    assert [record.getMessage() for record in watchlog.filter(logger.name)] == [str(i) for i in range(25)]
+
+
+@pytest.mark.parametrize("format, formatter_cls", [("json", JSONFormatter), ("binary", BinaryFormatter)])
+def test_watcher_from_url_format(watchlog, url, record, channel, format, formatter_cls):
+    if format == "binary":
+        pytest.importorskip("msgpack")
+
+    watcher = RedisLogWatcher.from_url(f"{url}?channel={channel}&format={format}")
+    assert watcher.deserialize is DESERIALIERS[format]
+
+    handler = RedisPublisher(url, channel)
+    handler.setFormatter(formatter_cls())
+
+    with watcher:
+        handler.emit(record)
+
+        deadline = time.monotonic() + 1.0
+        while not watchlog.any(record.name) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    actual = watchlog.last(record.name)
+    assert actual.msg == record.msg
+    assert actual.created == record.created
+
+
+def test_level_channels():
+    assert level_channels("app:{levelname}", "WARNING") == ["app:WARNING", "app:ERROR", "app:CRITICAL"]
+    assert level_channels("app:{levelno}:{name}", logging.ERROR) == ["app:40:*", "app:50:*"]
+    assert level_channels("app", logging.ERROR) == ["app"]
+    assert level_channels("{app}:{lineno}:{levelname}", logging.CRITICAL) == ["{app}:{lineno}:CRITICAL"]
+
+
+def test_publish_templated_channel(url, channel, record):
+
+    handler = RedisPublisher(url, f"{channel}:{{levelname}}:{{name}}")
+    handler.setFormatter(JSONFormatter())
+    assert handler.channel_for(record) == f"{channel}:{record.levelname}:{record.name}"
+
+    # Other text in braces, like a Redis Cluster hash tag, is not a template field.
+    handler = RedisPublisher(url, f"{{{channel}}}:logs")
+    assert handler.channel_for(record) == f"{{{channel}}}:logs"
+    handler = RedisStreamPublisher(url, f"{channel}{{1}}:{{levelno}}")
+    assert handler.channel_for(record) == f"{channel}{{1}}:{record.levelno}"
+    handler.close()
+
+
+def test_watcher_level_channels(watchlog, url, channel):
+
+    logger = logging.getLogger("test-redis-levels")
+    handler = BufferedRedisPublisher(url, f"{channel}:{{levelname}}", flush_interval=0.01)
+    handler.setFormatter(JSONFormatter())
+
+    watcher = RedisLogWatcher.from_url(f"{url}?pattern={channel}:[EC]*")
+    for name in level_channels(f"{channel}:{{levelname}}", logging.WARNING):
+        if "ERROR" not in name and "CRITICAL" not in name:
+            watcher.subscribe(name)
+
+    with watcher:
+        for level in (logging.DEBUG, logging.INFO, logging.WARNING, logging.ERROR, logging.CRITICAL):
+            handler.handle(logger.makeRecord(logger.name, level, __file__, 1, "message", (), None))
+        handler.flush()
+
+        deadline = time.monotonic() + 1.0
+        while len(watchlog.filter(logger.name)) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    handler.close()
+
+    assert [r.levelno for r in watchlog.filter(logger.name)] == [logging.WARNING, logging.ERROR, logging.CRITICAL]
+
+
+@pytest.mark.parametrize("header", [True, False])
+def test_watcher_prefilter(watchlog, url, channel, header, monkeypatch):
+
+    handler = RedisPublisher(url, channel, header=header)
+    handler.setFormatter(JSONFormatter())
+
+    decoded = []
+
+    def deserialize(data):
+        decoded.append(data)
+        return makeLogRecordfromJson(data)
+
+    watcher = RedisLogWatcher.from_url(f"{url}?channel={channel}&level=ERROR&logger=test-redis-prefilter")
+    monkeypatch.setattr(watcher, "deserialize", deserialize)
+
+    with watcher:
+        for name in ("test-redis-prefilter", "test-redis-prefilter.db", "test-redis-prefilter-other"):
+            logger = logging.getLogger(name)
+            for level in (logging.INFO, logging.ERROR):
+                handler.handle(logger.makeRecord(logger.name, level, __file__, 1, "message", (), None))
+
+        deadline = time.monotonic() + 1.0
+        while len(decoded) < (2 if header else 6) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+
+    assert watchlog.filter("test-redis-prefilter")[-1].levelno == logging.ERROR
+    assert len(watchlog.filter("test-redis-prefilter")) == 1
+    assert len(watchlog.filter("test-redis-prefilter.db")) == 1
+    assert not watchlog.any("test-redis-prefilter-other")
+    assert len(decoded) == (2 if header else 6)
@@ -0,0 +1,124 @@
+import time
+import uuid
+
+import pytest
+from flask import Blueprint
+from flask import Flask
+from flask_logging import FlaskLogging
+from flask_logging.sampling import get_sampler
+from flask_logging.sampling import RequestSampler
+
+
+@pytest.fixture
+def sampled_app(app: Flask) -> Flask:
+    app.config["FLASK_LOGGING_SAMPLE_RATE"] = 0.0
+
+    @app.route("/error")
+    def error():
+        return "error", 503
+
+    @app.route("/raises")
+    def raises():
+        raise ValueError("Oops")
+
+    @app.route("/slow")
+    def slow():
+        time.sleep(0.02)
+        return "slow"
+
+    @app.route("/health")
+    def health():
+        return "ok"
+
+    static = Blueprint("assets", __name__)
+
+    @static.route("/asset")
+    def asset():
+        return "asset"
+
+    app.register_blueprint(static)
+    return app
+
+
+def test_sample_consistent():
+    ids = [str(uuid.uuid4()) for _ in range(2000)]
+    decisions = [RequestSampler.sample(request_id, 0.25) for request_id in ids]
+
+    assert decisions == [RequestSampler.sample(request_id, 0.25) for request_id in ids]
+    assert 0.2 < sum(decisions) / len(decisions) < 0.3
+    assert RequestSampler.sample(None, 1.0)
+    assert not RequestSampler.sample("anything", 0.0)
+
+
+def test_sampler_rates():
+    sampler = RequestSampler(rate=0.5, endpoint_rates={"health": 0.0}, blueprint_rates={"assets": 0.1})
+    assert sampler.enabled
+    assert sampler.rate_for("health", None) == 0.0
+    assert sampler.rate_for("assets.asset", "assets") == 0.1
+    assert sampler.rate_for("home", None) == 0.5
+
+    assert not RequestSampler().enabled
+
+
+def test_sampling_disabled(client, app):
+    assert get_sampler(app) is None
+
+
+@pytest.mark.parametrize(
+    "path, logged", [("/", False), ("/error", True), ("/raises", True), ("/slow", True), ("/asset", False)]
+)
+def test_sampling_keep(sampled_app, watchlog, path, logged):
+    sampled_app.config["FLASK_LOGGING_SAMPLE_KEEP_SLOWER_THAN"] = 0.01
+    FlaskLogging(sampled_app)
+
+    with sampled_app.test_client() as client:
+        client.get(path)
+
+    assert not watchlog.any("test-flask-logging.request")
+    assert watchlog.any("test-flask-logging.response") is logged
+
+
+def test_sampling_rates(sampled_app, watchlog):
+    sampled_app.config["FLASK_LOGGING_SAMPLE_RATE"] = 1.0
+    sampled_app.config["FLASK_LOGGING_SAMPLE_ENDPOINT_RATES"] = {"health": 0.0}
+    sampled_app.config["FLASK_LOGGING_SAMPLE_BLUEPRINT_RATES"] = {"assets": 0.0}
+    FlaskLogging(sampled_app)
+
+    with sampled_app.test_client() as client:
+        client.get("/health")
+        client.get("/asset")
+        assert not watchlog.any("test-flask-logging.response")
+
+        client.get("/")
+        assert watchlog.any("test-flask-logging.request")
+        assert watchlog.any("test-flask-logging.response")
+
+
+def test_sampling_by_request_id(sampled_app, watchlog):
+    sampled_app.config["FLASK_LOGGING_SAMPLE_RATE"] = 0.5
+    FlaskLogging(sampled_app)
+
+    request_id = next(str(i) for i in range(100) if RequestSampler.sample(str(i), 0.5))
+    with sampled_app.test_client() as client:
+        client.get("/", headers={"X-Request-ID": request_id})
+
+    assert watchlog.any("test-flask-logging.request")
+    assert watchlog.last("test-flask-logging.response").request["id"] == request_id
+
+
+def test_sampling_generated_request_id(sampled_app, watchlog):
+    sampled_app.config["FLASK_LOGGING_SAMPLE_RATE"] = 0.5
+    FlaskLogging(sampled_app)
+
+    with sampled_app.test_client() as client:
+        for _ in range(50):
+            response = client.get("/")
+            request_id = response.headers["X-Request-ID"]
+            expected = RequestSampler.sample(request_id, 0.5)
+
+            logged = [
+                record
+                for record in watchlog.filter("test-flask-logging.response")
+                if record.request["id"] == request_id
+            ]
+            assert bool(logged) is expected
@@ -0,0 +1,255 @@
+import logging
+import threading
+
+import pytest
+from flask_logging.handlers.json import JSONFormatter
+from flask_logging.handlers.json import makeLogRecordfromJson
+from flask_logging.handlers.spill import _read_entries
+from flask_logging.handlers.spill import CircuitBreaker
+from flask_logging.handlers.spill import SpillFile
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def entries(spill):
+    with open(spill.path, "rb") as f:
+        return [(channel, message) for _, channel, message in _read_entries(f)]
+
+
+def test_circuit_breaker():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=5.0, clock=clock)
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 5.0
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow(), "Only one trial call is allowed"
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_spill_file_replay(tmp_path):
+    spill = SpillFile(tmp_path / "spill.log")
+    assert not spill
+
+    spill.append([("a", "first"), ("b", b"second")])
+    spill.append([("a", "third")])
+    assert len(spill) == 3
+
+    sent = []
+    assert spill.replay(sent.extend, batch_size=2) == 3
+    assert sent == [("a", b"first"), ("b", b"second"), ("a", b"third")]
+    assert not spill
+    assert not (tmp_path / "spill.log").exists()
+
+
+def test_spill_file_partial_replay(tmp_path):
+    spill = SpillFile(tmp_path / "spill.log")
+    spill.append([("channel", str(i)) for i in range(5)])
+
+    sent = []
+
+    def send(batch):
+        if len(sent) >= 2:
+            raise ConnectionError("unavailable")
+        sent.extend(batch)
+
+    with pytest.raises(ConnectionError):
+        spill.replay(send, batch_size=2)
+
+    assert sent == [("channel", b"0"), ("channel", b"1")]
+    spill.append([("channel", "5")])
+    assert [msg for _, msg in entries(spill)] == [b"2", b"3", b"4", b"5"]
+
+
+def test_spill_file_limited_replay(tmp_path):
+    spill = SpillFile(tmp_path / "spill.log")
+    spill.append([("channel", str(i)) for i in range(5)])
+
+    sent = []
+    assert spill.replay(sent.extend, batch_size=2, max_batches=1) == 2
+    assert spill.pending
+    assert entries(spill) == [("channel", b"2"), ("channel", b"3"), ("channel", b"4")]
+
+    assert spill.replay(sent.extend, batch_size=2, max_batches=2) == 3
+    assert not spill.pending
+    assert [msg for _, msg in sent] == [b"0", b"1", b"2", b"3", b"4"]
+    assert not spill
+
+
+def test_spill_file_size_cap(tmp_path):
+    spill = SpillFile(tmp_path / "spill.log", max_bytes=45)
+    spill.append([("c", "0123456789"), ("c", "0123456789"), ("c", "x")])
+
+    assert entries(spill) == [("c", b"0123456789"), ("c", b"x")]
+    assert spill.dropped == 1
+    assert spill.size <= 45
+
+
+def test_spill_file_partial_write(tmp_path):
+    spill = SpillFile(tmp_path / "spill.log")
+    spill.append([("c", "first"), ("c", "torn")])
+    data = (tmp_path / "spill.log").read_bytes()
+    (tmp_path / "spill.log").write_bytes(data[:-2])
+
+    spill.append([("c", "second"), ("c", "third")])
+
+    sent = []
+    assert spill.replay(sent.extend) == 3
+    assert sent == [("c", b"first"), ("c", b"second"), ("c", b"third")]
+    assert not spill.pending
+
+
+def test_spill_file_shared(tmp_path):
+    spill = SpillFile(tmp_path / "spill.log")
+    other = SpillFile(tmp_path / "spill.log")
+    spill.append([("c", "first")])
+    assert other.pending
+
+    sent = []
+    appender = threading.Thread(target=other.append, args=([("c", "second")],))
+
+    def send(batch):
+        # The other process appends while this one is replaying.
+        appender.start()
+        appender.join(timeout=0.1)
+        sent.extend(batch)
+
+    assert spill.replay(send) == 1
+    appender.join()
+    assert sent == [("c", b"first")]
+    assert entries(other) == [("c", b"second")]
+
+    assert not spill.pending
+    other.replay(sent.extend)
+    assert not other.pending
+    assert not spill
+
+
+@pytest.fixture
+def server():
+    fakeredis = pytest.importorskip("fakeredis")
+    yield fakeredis.FakeServer()
+
+
+def subscribe(server, channel):
+    import fakeredis
+
+    pubsub = fakeredis.FakeRedis(server=server).pubsub()
+    pubsub.subscribe(channel)
+    pubsub.get_message(timeout=0)
+    return pubsub
+
+
+def received(pubsub):
+    messages = []
+    message = pubsub.get_message(ignore_subscribe_messages=True, timeout=0)
+    while message is not None:
+        messages.append(makeLogRecordfromJson(message["data"]).msg)
+        message = pubsub.get_message(ignore_subscribe_messages=True, timeout=0)
+    return messages
+
+
+def log(handler, logger, msg):
+    handler.handle(logger.makeRecord(logger.name, logging.INFO, __file__, 1, msg, (), None))
+
+
+def test_publisher_spills_during_outage(server, tmp_path, monkeypatch):
+    import fakeredis
+    from flask_logging.handlers.redis import RedisPublisher
+
+    pubsub = subscribe(server, "test-spill")
+    spill = SpillFile(tmp_path / "spill.log")
+    handler = RedisPublisher(fakeredis.FakeRedis(server=server), "test-spill", spill=spill, retry_interval=60)
+    handler.setFormatter(JSONFormatter())
+    logger = logging.getLogger("test-spill")
+
+    log(handler, logger, "before")
+    assert received(pubsub) == ["before"]
+
+    attempts = []
+    original = handler._publish_now
+    monkeypatch.setattr(handler, "_publish_now", lambda messages: attempts.append(messages) or original(messages))
+
+    server.connected = False
+    log(handler, logger, "during 1")
+    log(handler, logger, "during 2")
+    assert len(attempts) == 1, "The circuit breaker should stop further connection attempts"
+    assert len(spill) == 2
+
+    server.connected = True
+    log(handler, logger, "still waiting")
+    assert received(pubsub) == []
+
+    handler.breaker.clock = lambda: float("inf")
+    log(handler, logger, "after")
+    assert received(pubsub) == ["during 1", "during 2", "still waiting", "after"]
+    assert not spill
+    assert handler.breaker.state == "closed"
+
+
+def test_buffered_publisher_spills_during_outage(server, tmp_path):
+    import fakeredis
+    from flask_logging.handlers.redis import BufferedRedisPublisher
+
+    pubsub = subscribe(server, "test-spill")
+    spill = SpillFile(tmp_path / "spill.log")
+    handler = BufferedRedisPublisher(
+        fakeredis.FakeRedis(server=server), "test-spill", batch_size=10, flush_interval=60, spill=spill
+    )
+    handler.setFormatter(JSONFormatter())
+    logger = logging.getLogger("test-spill")
+
+    server.connected = False
+    for i in range(3):
+        log(handler, logger, str(i))
+    handler.flush()
+    assert len(spill) == 3
+    assert handler.dropped["error"] == 0
+
+    server.connected = True
+    handler.breaker.record_success()
+    log(handler, logger, "3")
+    handler.close()
+
+    assert received(pubsub) == ["0", "1", "2", "3"]
+    assert not spill
+
+
+def test_publisher_replays_in_steps(server, tmp_path, monkeypatch):
+    import fakeredis
+    from flask_logging.handlers import redis as redis_handlers
+
+    monkeypatch.setattr(redis_handlers, "REPLAY_BATCHES", 1)
+    pubsub = subscribe(server, "test-spill")
+    spill = SpillFile(tmp_path / "spill.log")
+    formatter = JSONFormatter()
+    logger = logging.getLogger("test-spill")
+    records = [logger.makeRecord(logger.name, logging.INFO, __file__, 1, str(i), (), None) for i in range(150)]
+    spill.append([("test-spill", formatter.format(record)) for record in records])
+
+    handler = redis_handlers.RedisPublisher(fakeredis.FakeRedis(server=server), "test-spill", spill=spill)
+    handler.setFormatter(formatter)
+
+    log(handler, logger, "first")
+    assert received(pubsub) == [str(i) for i in range(100)]
+    assert len(spill) == 51
+
+    log(handler, logger, "second")
+    assert received(pubsub) == [str(i) for i in range(100, 150)] + ["first", "second"]
+    assert not spill
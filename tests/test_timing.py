@@ -0,0 +1,126 @@
+import io
+import time
+
+import pytest
+from flask import Blueprint
+from flask import Flask
+from flask import g
+from flask import Response
+from flask import send_file
+from flask import stream_with_context
+from flask_logging import FlaskLogging
+from flask_logging.timing import get_phase_timer
+from flask_logging.timing import request_phases
+from flask_logging.timing import server_timing
+
+
+@pytest.fixture
+def timed_app(app: Flask) -> Flask:
+    app.config["FLASK_LOGGING_REQUEST_PHASES"] = True
+    app.config["FLASK_LOGGING_SERVER_TIMING"] = True
+
+    @app.before_request
+    def slow_hook():
+        time.sleep(0.01)
+
+    @app.teardown_request
+    def slow_teardown(exc):
+        time.sleep(0.01)
+
+    @app.route("/stream")
+    def stream():
+        def generate():
+            time.sleep(0.01)
+            yield "a"
+            yield "b"
+
+        return Response(stream_with_context(generate()))
+
+    @app.route("/file")
+    def file():
+        return send_file(io.BytesIO(b"data"), mimetype="application/octet-stream")
+
+    views = Blueprint("views", __name__)
+
+    @views.before_request
+    def blueprint_hook():
+        g.blueprint_hook = time.perf_counter_ns()
+
+    @views.teardown_request
+    def blueprint_teardown(exc):
+        time.sleep(0.02)
+
+    @views.route("/slow")
+    def slow():
+        time.sleep(0.02)
+        return "slow"
+
+    app.register_blueprint(views)
+    return app
+
+
+def test_request_phases():
+    marks = {"start": 0, "view": 10, "after_request": 25, "response": 30}
+    assert request_phases(marks) == {"before_request": 10, "view": 15, "after_request": 5}
+    assert server_timing({"view": 1_500_000, "teardown": 1}) == "view;dur=1.500"
+
+
+def test_phases_disabled(client, app):
+    assert get_phase_timer(app) is None
+    response = client.get("/")
+    assert "Server-Timing" not in response.headers
+
+
+def test_phases_response(timed_app, watchlog):
+    FlaskLogging(timed_app)
+    assert get_phase_timer(timed_app) is not None
+
+    with timed_app.test_client() as client:
+        client.get("/slow")
+        assert g.blueprint_hook < g._flask_logging_phase_marks["view"]
+
+    # A WSGI server closes the response once it has been sent.
+    response = timed_app.test_client().get("/slow")
+    response.close()
+
+    finished, phased = watchlog.filter("test-flask-logging.response")[-2:]
+    assert finished.event == "request_finished"
+    phases = finished.response["phases"]
+    assert set(phases) == {"before_request", "view", "after_request"}
+    assert phases["before_request"] >= 10_000_000
+    assert phases["view"] >= 20_000_000
+
+    header = response.headers["Server-Timing"]
+    assert header.startswith("before_request;dur=")
+    assert "view;dur=" in header
+
+    assert phased.event == "request_phases"
+    # Teardown includes the hooks for the app and the blueprint.
+    assert phased.phases["teardown"] >= 30_000_000
+    assert phased.phases["view"] == phases["view"]
+    assert phased.request_id == response.headers["X-Request-ID"]
+
+
+def test_phases_first_byte(timed_app, watchlog):
+    FlaskLogging(timed_app)
+
+    response = timed_app.test_client().get("/stream")
+    assert response.get_data() == b"ab"
+    response.close()
+
+    record = watchlog.last("test-flask-logging.response")
+    assert record.event == "request_phases"
+    assert record.phases["first_byte"] >= 10_000_000
+    assert "teardown" in record.phases
+
+
+def test_phases_file(timed_app, watchlog):
+    FlaskLogging(timed_app)
+
+    response = timed_app.test_client().get("/file")
+    assert response.get_data() == b"data"
+    response.close()
+
+    record = watchlog.last("test-flask-logging.response")
+    assert record.event == "request_phases"
+    assert "first_byte" not in record.phases